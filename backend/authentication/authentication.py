@@ -0,0 +1,175 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def from_fields(model, values):
+    """
+    Instance of ``model`` from a dict of field values, fields missing from it
+    are deferred and load from the database on access.
+    """
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    return model.from_db(None, names, [values[name] for name in names])
+
+
+class TokenCache:
+    """
+    Bounded LRU of authenticated ``(user, token)`` pairs keyed by token key,
+    with entries expiring after ``AUTH_TOKEN_CACHE_TTL`` seconds.
+
+    With ``AUTH_TOKEN_CACHE_SHARED`` the pairs are also kept in Django's cache
+    so other workers skip the database too, holding only ``USER_FIELDS`` of
+    the user. Every token then has a version in the shared cache, entries are
+    stored under the version read before the database was, and invalidating a
+    token or its user replaces that version, so every worker drops its local
+    copy on the next request. Signals invalidate as soon as a user or token
+    changes and again once the change commits.
+    """
+
+    USER_FIELDS = (
+        "id",
+        "username",
+        "first_name",
+        "last_name",
+        "email",
+        "role",
+        "type",
+        "start_of_employment",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+        "date_joined",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def ttl(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60)
+
+    @property
+    def max_size(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 1024)
+
+    @property
+    def shared(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_SHARED", False)
+
+    def shared_key(self, key):
+        return f"auth-token:{key}"
+
+    def version_key(self, key):
+        return f"auth-token:{key}:version"
+
+    def version(self, key):
+        """
+        The shared version of the token ``key``, None unless shared.
+        """
+        if not self.shared:
+            return None
+        version_key = self.version_key(key)
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, uuid4().hex, timeout=self.ttl)
+            version = cache.get(version_key)
+        return version
+
+    def get(self, key, version=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now and entry[1] == version:
+                    self._entries.move_to_end(key)
+                    return entry[2], entry[3]
+                del self._entries[key]
+
+        if self.shared:
+            entry = cache.get(self.shared_key(key))
+            if entry is not None and entry["version"] == version:
+                user = from_fields(get_user_model(), entry["user"])
+                token = from_fields(Token, entry["token"])
+                token.user = user
+                self._store(key, version, user, token)
+                return user, token
+        return None
+
+    def set(self, key, user, token, version=None):
+        self._store(key, version, user, token)
+        if self.shared:
+            entry = {
+                "version": version,
+                "user": {field: getattr(user, field) for field in self.USER_FIELDS},
+                "token": {
+                    "key": token.key,
+                    "user_id": token.user_id,
+                    "created": token.created,
+                },
+            }
+            cache.set(self.shared_key(key), entry, timeout=self.ttl)
+
+    def _store(self, key, version, user, token):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared and keys:
+            cache.set_many(
+                {self.version_key(key): uuid4().hex for key in keys},
+                timeout=self.ttl,
+            )
+            cache.delete_many([self.shared_key(key) for key in keys])
+
+    def invalidate_user(self, user_id, keys=()):
+        with self._lock:
+            keys = set(keys) | {
+                key for key, entry in self._entries.items() if entry[2].pk == user_id
+            }
+        self.invalidate(*keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that looks tokens up in ``token_cache`` before
+    querying the token and user tables.
+    """
+
+    def authenticate_credentials(self, key):
+        # Read before the database, a change committed in between leaves the
+        # entry under a version that is already stale.
+        version = token_cache.version(key)
+        cached = token_cache.get(key, version)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token, version)
+        else:
+            user, token = cached
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        # Each request gets its own user object.
+        return copy.copy(user), token
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import User
+
+
+# Entries are dropped again on commit, a request that authenticated against the
+# old rows in the meantime would otherwise cache them for the whole TTL.
+# Deleting clears the primary key, so ids and keys are read up front.
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    user_id = instance.pk
+    keys = list(Token.objects.filter(user_id=user_id).values_list("key", flat=True))
+    token_cache.invalidate_user(user_id, keys)
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id, keys))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    key = instance.key
+    token_cache.invalidate(key)
+    transaction.on_commit(lambda: token_cache.invalidate(key))
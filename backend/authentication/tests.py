@@ -1,8 +1,15 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from .authentication import TokenCache, token_cache
 from .models import User
 from constants import UserRoles, ALLOWED_EMAILS
 
@@ -69,6 +76,16 @@ class UserViewSetTests(APITestCase):
         response = self.client.get(self.user_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_list_users_by_page(self):
+        for i in range(3):
+            User.objects.create_user(username=f"user{i}", password="userpassword123")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        response = self.client.get(self.user_url, {"page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
+
     def test_list_users_as_non_admin(self):
         non_admin_token = Token.objects.create(user=self.user)
         self.client.credentials(HTTP_AUTHORIZATION="Token " + non_admin_token.key)
@@ -89,3 +106,111 @@ class UserViewSetTests(APITestCase):
         edit_url = reverse("authentication:user-edit", args=[self.user.id])
         response = self.client.patch(edit_url, {"first_name": "NewName"}, format="json")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="pw"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        self.me_url = reverse("authentication:me")
+
+    def count_queries(self, expected_status=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.status_code, expected_status)
+        return len(queries)
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.assertEqual(self.count_queries(), 1)
+        self.assertEqual(self.count_queries(), 0)
+
+    def test_changes_to_the_user_are_picked_up(self):
+        self.count_queries()
+        self.user.role = UserRoles.MANAGER
+        self.user.save()
+        self.assertEqual(self.client.get(self.me_url).data["role"], "Manager")
+
+        self.user.is_active = False
+        self.user.save()
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_rejected(self):
+        self.count_queries()
+        self.token.delete()
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_entries_are_dropped_again_on_commit(self):
+        stale_user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A concurrent request that read the row from before the write.
+            token_cache.set(self.token.key, stale_user, self.token)
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_entry_is_dropped_again_on_commit(self):
+        key = self.token.key
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+            token_cache.set(key, self.user, self.token)
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    def test_entries_expire(self):
+        self.count_queries()
+        with mock.patch(
+            "authentication.authentication.time.monotonic",
+            return_value=10**9,
+        ):
+            self.assertEqual(self.count_queries(), 1)
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE=1)
+    def test_cache_is_bounded(self):
+        other = User.objects.create_user(username="other", password="pw")
+        other_token = Token.objects.create(user=other)
+        self.count_queries()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + other_token.key)
+        self.count_queries()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        self.assertEqual(self.count_queries(), 1)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_shared_cache_serves_other_workers(self):
+        self.count_queries()
+        token_cache.clear()
+        self.assertEqual(self.count_queries(), 0)
+
+        self.user.is_active = False
+        self.user.save()
+        token_cache.clear()
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_other_workers_drop_their_local_entries(self):
+        self.count_queries()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Invalidated by another worker, with its own local entries.
+        TokenCache().invalidate_user(self.user.pk, [self.token.key])
+        self.count_queries(status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_shared_cache_holds_only_the_user_fields(self):
+        self.user.role = UserRoles.MANAGER
+        self.user.save()
+        self.count_queries()
+        entry = cache.get(token_cache.shared_key(self.token.key))
+        self.assertEqual(set(entry["user"]), set(TokenCache.USER_FIELDS))
+
+        token_cache.clear()
+        key = self.token.key
+        user, token = token_cache.get(key, token_cache.version(key))
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.role, UserRoles.MANAGER)
+        self.assertEqual(user.email, "testuser@example.com")
+        self.assertEqual(token.created, self.token.created)
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertEqual(self.client.get(self.me_url).data["role"], "Manager")
@@ -59,6 +59,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.filter(is_staff=False)
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedAdmin]
+    keyset_ordering = ("date_joined", "id")
 
     def get_serializer_class(self):
         if self.action == "edit":
@@ -65,6 +65,13 @@ class QueueAdmin(admin.ModelAdmin):
     list_display = [
         field.name for field in Queue._meta.get_fields() if not field.is_relation
     ]
+    actions = ["run_assignment_pipeline"]
+
+    def run_assignment_pipeline(self, request, queryset):
+        count = sum(len(queue.assignment_pipeline()) for queue in queryset)
+        self.message_user(request, f"{count} assignments created.")
+
+    run_assignment_pipeline.short_description = "Run assignment pipeline"
 
 
 class ScoringFormItemAdmin(admin.ModelAdmin):
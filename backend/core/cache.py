@@ -0,0 +1,146 @@
+import hashlib
+import threading
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import Announcement, FaqComponent, ScoringFormItem
+from .serializers import AnnouncementSerializer, FaqComponentSerializer
+
+# Versions and the entries stored under them expire after a day, so entries
+# orphaned by a newer version don't pile up in a shared cache. An expired
+# version is replaced by a new one, which only costs a reload.
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+class ScoringFormItemSnapshot:
+    """
+    The ScoringFormItem table at one version, indexed by id and by label.
+    """
+
+    def __init__(self, version, items=()):
+        self.version = version
+        self.by_id = {}
+        self.by_label = {}
+        for item in items:
+            self.by_id[item.pk] = item
+            self.by_label.setdefault(item.label, item)
+
+    def get(self, item_id):
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return None
+        return self.by_id.get(item_id)
+
+    def get_by_label(self, label):
+        return self.by_label.get(label)
+
+
+class ScoringFormItemRegistry:
+    """
+    In-process copy of the ScoringFormItem table.
+
+    The table is reloaded whenever the version stored in the cache changes,
+    saving or deleting a ScoringFormItem replaces that version. Callers that
+    look up several items should take one ``snapshot`` and read from it, so
+    the version is fetched from the cache once rather than per item.
+    """
+
+    version_key = "scoring-form-items:version"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = ScoringFormItemSnapshot(None)
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid4().hex, timeout=VERSION_TIMEOUT)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        cache.set(self.version_key, uuid4().hex, timeout=VERSION_TIMEOUT)
+
+    def invalidate(self):
+        # Bumped again on commit, a reader that loaded the old rows in the
+        # meantime would otherwise keep them under the new version.
+        self.bump()
+        transaction.on_commit(self.bump)
+
+    def snapshot(self):
+        version = self.current_version()
+        if self._snapshot.version == version:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot.version != version:
+                self._snapshot = ScoringFormItemSnapshot(
+                    version, ScoringFormItem.objects.order_by("pk")
+                )
+        return self._snapshot
+
+    def get(self, item_id):
+        return self.snapshot().get(item_id)
+
+    def get_by_label(self, label):
+        return self.snapshot().get_by_label(label)
+
+
+scoring_form_items = ScoringFormItemRegistry()
+
+
+class RenderedListCache:
+    """
+    JSON body and ETag of a public list endpoint, rendered once and shared
+    through the cache until ``invalidate`` replaces the version.
+    """
+
+    def __init__(self, name, queryset, serializer_class):
+        self.version_key = f"{name}:version"
+        self.name = name
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+
+    def bump(self):
+        cache.set(self.version_key, uuid4().hex, timeout=VERSION_TIMEOUT)
+
+    def invalidate(self):
+        # Bumped again on commit, a rendering of the old rows made in the
+        # meantime would otherwise be served under the new version.
+        self.bump()
+        transaction.on_commit(self.bump)
+
+    def render(self):
+        data = self.serializer_class(self.queryset.all(), many=True).data
+        content = JSONRenderer().render(data)
+        return f'"{hashlib.sha1(content).hexdigest()}"', content
+
+    def get(self):
+        """Returns the ``(etag, content)`` pair of the current version."""
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid4().hex, timeout=VERSION_TIMEOUT)
+            version = cache.get(self.version_key)
+
+        key = f"{self.name}:{version}"
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = self.render()
+            cache.set(key, rendered, timeout=VERSION_TIMEOUT)
+        return rendered
+
+
+announcements = RenderedListCache(
+    "announcements",
+    Announcement.objects.filter(is_visible=True).order_by("-created_at"),
+    AnnouncementSerializer,
+)
+faq_components = RenderedListCache(
+    "faq-components",
+    FaqComponent.objects.filter(is_visible=True).order_by("order"),
+    FaqComponentSerializer,
+)
@@ -47,6 +47,10 @@ class FormItemTypes(IntegerChoices):
     TEXT = 3, "Text"
 
 
+# Largest integer answer accepted for a scoring form item.
+MAX_INTEGER_ANSWER = 10_000
+
+
 SIRA_TAHSIS_4_NOLU_CETVEL_FORM = [
     {
         "label": "Kaç tane gazi ve şehit yakınınız var?",
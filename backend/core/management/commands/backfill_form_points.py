@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Application, Form
+from core.priority import priority_queues
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored base points of every form from its items."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            stale = Form.objects.stale_base_points().values("application_id")
+            queue_ids = set(
+                Application.objects.filter(pk__in=stale).values_list(
+                    "queue_id", flat=True
+                )
+            )
+            updated = Form.objects.refresh_base_points()
+            # The update sends no signals, the rescored queues are dropped here.
+            priority_queues.invalidate(*queue_ids)
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} forms."))
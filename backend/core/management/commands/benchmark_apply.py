@@ -0,0 +1,86 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from constants import PersonalType
+from core.constants import LodgementType, LodgementSize
+from core.models import Queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply to a throwaway queue with many users at once and report latency. "
+        "Everything the benchmark creates is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=32)
+
+    def apply(self, user_id, queue_id):
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(user=User(pk=user_id))
+        started = time.perf_counter()
+        try:
+            response = client.post(reverse("core:queue-apply", kwargs={"pk": queue_id}))
+            return time.perf_counter() - started, response.status_code
+        finally:
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        run = uuid4().hex[:8]
+        queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"benchmark-apply-{run}-{i}",
+                    email=f"{run}-{i}@example.com",
+                )
+                for i in range(options["users"])
+            ]
+        )
+        user_ids = list(
+            User.objects.filter(
+                username__startswith=f"benchmark-apply-{run}-"
+            ).values_list("pk", flat=True)
+        )
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda user_id: self.apply(user_id, queue.pk), user_ids
+                    )
+                )
+            elapsed = time.perf_counter() - started
+        finally:
+            User.objects.filter(pk__in=user_ids).delete()
+            queue.delete()
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        failed = sum(1 for _, status_code in results if status_code != 201)
+        quantiles = (
+            statistics.quantiles(latencies, n=100)
+            if len(latencies) > 1
+            else latencies * 99
+        )
+        self.stdout.write(
+            f"{len(users)} applications with concurrency {options['concurrency']} "
+            f"in {elapsed:.2f}s ({len(users) / elapsed:.1f}/s), {failed} failed"
+        )
+        self.stdout.write(
+            f"latency ms: p50 {quantiles[49]:.1f}, p95 {quantiles[94]:.1f}, "
+            f"p99 {quantiles[98]:.1f}, max {latencies[-1]:.1f}"
+        )
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.constants import ApplicationStatus
+from core.models import Application
+
+# Active statuses from the furthest along to the least.
+PROGRESS = [
+    ApplicationStatus.ASSIGNED,
+    ApplicationStatus.APPROVED,
+    ApplicationStatus.PENDING,
+    ApplicationStatus.RE_UPLOAD,
+    ApplicationStatus.IN_PROGRESS,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "List users with more than one active application in a queue and the "
+        "ones that would be cancelled. Only cancels them with --apply."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Cancel the listed applications instead of only listing them.",
+        )
+
+    def handle(self, *args, **options):
+        # The furthest along application is kept, the latest among equals.
+        active = Application.objects.exclude(
+            status__in=[ApplicationStatus.CANCELLED, ApplicationStatus.REJECTED]
+        ).order_by("-created_at", "-pk")
+        kept = {}
+        duplicates = []
+        for application in sorted(
+            active, key=lambda application: PROGRESS.index(application.status)
+        ):
+            key = (application.user_id, application.queue_id)
+            if key in kept:
+                duplicates.append((application, kept[key]))
+            else:
+                kept[key] = application
+
+        verb = "Cancelling" if options["apply"] else "Would cancel"
+        for application, kept_application in duplicates:
+            self.stdout.write(
+                f"{verb} application {application.pk} "
+                f"({application.get_status_display()}) of user "
+                f"{application.user_id} in queue {application.queue_id}, keeping "
+                f"{kept_application.pk} ({kept_application.get_status_display()})"
+            )
+
+        if not duplicates:
+            self.stdout.write(self.style.SUCCESS("No duplicate active applications."))
+        elif options["apply"]:
+            with transaction.atomic():
+                for application, _ in duplicates:
+                    application.status = ApplicationStatus.CANCELLED
+                    application.save(update_fields=["status", "updated_at"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Cancelled {len(duplicates)} applications.")
+            )
+        else:
+            self.stdout.write(
+                f"{len(duplicates)} applications would be cancelled, "
+                "run again with --apply to cancel them."
+            )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Form
+
+
+class Command(BaseCommand):
+    help = "Compare the stored base points of every form against its items."
+
+    def handle(self, *args, **options):
+        stale = 0
+        for form in Form.objects.stale_base_points().order_by("pk").iterator():
+            stale += 1
+            self.stdout.write(
+                f"Form {form.pk} (application {form.application_id}): "
+                f"stored {form.base_points}, live {form.live_base_points}"
+            )
+
+        if stale:
+            raise CommandError(
+                f"{stale} forms have stale base points, run backfill_form_points."
+            )
+        self.stdout.write(self.style.SUCCESS("All stored base points are up to date."))
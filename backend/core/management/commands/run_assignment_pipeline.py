@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import Queue
+
+
+def run_queue(queue_id, dry_run=False, close_connections=False):
+    started = time.perf_counter()
+    result = {"queue_id": queue_id, "assignments": [], "error": None}
+    try:
+        queue = Queue.objects.get(pk=queue_id)
+        if dry_run:
+            planned = queue.simulate_assignments()["assignments"]
+            result["assignments"] = [
+                (application.pk, lodgement.pk, start_date)
+                for application, lodgement, start_date in planned
+            ]
+        else:
+            result["assignments"] = [
+                (
+                    assignment.application_id,
+                    assignment.lodgement_id,
+                    assignment.start_date,
+                )
+                for assignment in queue.assignment_pipeline()
+            ]
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if close_connections:
+            connections.close_all()
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+class Command(BaseCommand):
+    help = "Run the assignment pipeline of every queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue", type=int, nargs="*", help="Only run the given queue IDs."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of queues to run at the same time.",
+        )
+        parser.add_argument(
+            "--executor", choices=["thread", "process"], default="thread"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the planned assignments without writing them.",
+        )
+
+    def handle(self, *args, **options):
+        queues = Queue.objects.order_by("pk")
+        if options["queue"]:
+            queues = queues.filter(pk__in=options["queue"])
+        queue_ids = list(queues.values_list("pk", flat=True))
+
+        started = time.perf_counter()
+        if options["workers"] <= 1:
+            results = [
+                run_queue(queue_id, dry_run=options["dry_run"])
+                for queue_id in queue_ids
+            ]
+        else:
+            if options["executor"] == "process":
+                # Forked workers must not share the parent's connections.
+                connections.close_all()
+                executor = ProcessPoolExecutor(
+                    max_workers=options["workers"],
+                    mp_context=multiprocessing.get_context("fork"),
+                )
+            else:
+                executor = ThreadPoolExecutor(max_workers=options["workers"])
+            with executor:
+                results = list(
+                    executor.map(
+                        partial(
+                            run_queue,
+                            dry_run=options["dry_run"],
+                            close_connections=True,
+                        ),
+                        queue_ids,
+                    )
+                )
+        elapsed = time.perf_counter() - started
+
+        names = {
+            queue.pk: str(queue) for queue in Queue.objects.filter(pk__in=queue_ids)
+        }
+        verb = "planned" if options["dry_run"] else "assignments"
+        failed = 0
+        total = 0
+        for result in results:
+            queue_id = result["queue_id"]
+            count = len(result["assignments"])
+            total += count
+            if result["error"]:
+                failed += 1
+                self.stderr.write(
+                    f"Queue {queue_id} ({names[queue_id]}) failed after "
+                    f"{result['elapsed']:.2f}s: {result['error']}"
+                )
+                continue
+
+            self.stdout.write(
+                f"Queue {queue_id} ({names[queue_id]}): {count} {verb} "
+                f"in {result['elapsed']:.2f}s"
+            )
+            if options["dry_run"]:
+                for application_id, lodgement_id, start_date in result["assignments"]:
+                    self.stdout.write(
+                        f"  application {application_id} -> lodgement "
+                        f"{lodgement_id} from {start_date}"
+                    )
+
+        summary = f"{total} {verb} across {len(results)} queues in {elapsed:.2f}s"
+        if failed:
+            raise CommandError(f"{summary}, {failed} queues failed.")
+        self.stdout.write(self.style.SUCCESS(summary))
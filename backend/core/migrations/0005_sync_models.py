@@ -0,0 +1,264 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0004_lodgement_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Announcement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("title", models.CharField(max_length=200)),
+                ("content", models.TextField()),
+                ("is_visible", models.BooleanField(default=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="FaqComponent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("question", models.TextField()),
+                ("answer", models.TextField()),
+                ("order", models.IntegerField()),
+                ("is_visible", models.BooleanField(default=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="Form",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("type", models.IntegerField(choices=[(1, "4 No'lu Cetvel")])),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ScoringFormItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("type", models.IntegerField(choices=[(1, "4 No'lu Cetvel")])),
+                ("label", models.TextField()),
+                ("caption", models.TextField()),
+                (
+                    "field_type",
+                    models.IntegerField(
+                        choices=[(1, "Integer"), (2, "Boolean"), (3, "Text")]
+                    ),
+                ),
+                ("point", models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name="application",
+            name="documents",
+        ),
+        migrations.RemoveField(
+            model_name="application",
+            name="points",
+        ),
+        migrations.RemoveField(
+            model_name="document",
+            name="pdf_path",
+        ),
+        migrations.RemoveField(
+            model_name="lodgement",
+            name="required_documents",
+        ),
+        migrations.AddField(
+            model_name="application",
+            name="system_message",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="applicationdocument",
+            name="description",
+            field=models.TextField(default=""),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="applicationdocument",
+            name="file",
+            field=models.FileField(default="", upload_to="application_documents/"),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="description",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="pdf_file",
+            field=models.FileField(blank=True, null=True, upload_to="documents/"),
+        ),
+        migrations.AddField(
+            model_name="queue",
+            name="required_documents",
+            field=models.ManyToManyField(
+                blank=True, related_name="queues", to="core.document"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="application",
+            name="status",
+            field=models.IntegerField(
+                choices=[
+                    (1, "In Progress"),
+                    (2, "Pending"),
+                    (3, "Approved"),
+                    (4, "Rejected"),
+                    (5, "Re Upload"),
+                    (6, "Cancelled"),
+                    (7, "Assigned"),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="applicationdocument",
+            name="application",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="documents",
+                to="core.application",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="document",
+            name="name",
+            field=models.TextField(),
+        ),
+        migrations.AlterField(
+            model_name="lodgement",
+            name="busy_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="lodgement",
+            name="size",
+            field=models.TextField(
+                choices=[("1+1", "One Plus One"), ("2+1", "Two Plus One")]
+            ),
+        ),
+        migrations.CreateModel(
+            name="ScoringFormLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data", models.JSONField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scoring_form_logs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FormItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("label", models.TextField()),
+                ("caption", models.TextField()),
+                (
+                    "field_type",
+                    models.IntegerField(
+                        choices=[(1, "Integer"), (2, "Boolean"), (3, "Text")]
+                    ),
+                ),
+                ("point", models.IntegerField(blank=True, null=True)),
+                ("answer", models.JSONField(blank=True, null=True)),
+                (
+                    "form",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="core.form",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="form",
+            name="application",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="forms",
+                to="core.application",
+            ),
+        ),
+    ]
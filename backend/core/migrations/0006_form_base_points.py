@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+INTEGER = 1
+BOOLEAN = 2
+# core.constants.MAX_INTEGER_ANSWER, larger answers earn no points.
+MAX_INTEGER_ANSWER = 10_000
+
+
+def earned_points(item):
+    value = (item.answer or {}).get("value")
+    if not item.point or value is None:
+        return 0
+    if item.field_type == INTEGER:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return 0
+        if abs(value) > MAX_INTEGER_ANSWER:
+            return 0
+        return item.point * value
+    elif item.field_type == BOOLEAN:
+        return item.point if value else 0
+    return 0
+
+
+def backfill_base_points(apps, schema_editor):
+    Form = apps.get_model("core", "Form")
+    forms = Form.objects.prefetch_related("items").order_by("pk")
+    batch = []
+    for form in forms.iterator(chunk_size=500):
+        form.base_points = sum(earned_points(item) for item in form.items.all())
+        batch.append(form)
+    Form.objects.bulk_update(batch, ["base_points"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0005_sync_models"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="base_points",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_base_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_form_base_points"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="announcement",
+            index=models.Index(
+                condition=models.Q(("is_visible", True)),
+                fields=["-created_at"],
+                name="announcement_visible_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="application",
+            index=models.Index(
+                fields=["queue", "status"], name="application_queue_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="application",
+            index=models.Index(
+                fields=["user", "queue", "status"], name="application_user_queue_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="form",
+            index=models.Index(
+                fields=["application", "type"], name="form_application_type_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lodgement",
+            index=models.Index(
+                fields=["queue", "busy_until"], name="lodgement_queue_busy_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scoringformlog",
+            index=models.Index(
+                fields=["user", "-id"], name="scoringformlog_user_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+CANCELLED = 6
+REJECTED = 4
+
+
+def check_duplicate_applications(apps, schema_editor):
+    # Cancelling live applications is left to cancel_duplicate_applications,
+    # after someone has reviewed its dry run.
+    Application = apps.get_model("core", "Application")
+    active = Application.objects.exclude(status__in=[CANCELLED, REJECTED])
+    duplicates = (
+        active.values("user_id", "queue_id")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+        .order_by("user_id", "queue_id")
+    )
+    conflicts = [
+        "user {user_id} in queue {queue_id}: applications {ids}".format(
+            ids=", ".join(
+                str(pk)
+                for pk in active.filter(
+                    user_id=row["user_id"], queue_id=row["queue_id"]
+                )
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            ),
+            **row,
+        )
+        for row in duplicates
+    ]
+    if conflicts:
+        raise RuntimeError(
+            "Users with more than one active application per queue:\n  "
+            + "\n  ".join(conflicts)
+            + "\nResolve them by hand or review and run "
+            "`manage.py cancel_duplicate_applications`, then migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_applications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="application",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", [6, 4]), _negated=True),
+                fields=("user", "queue"),
+                name="unique_active_application",
+            ),
+        ),
+    ]
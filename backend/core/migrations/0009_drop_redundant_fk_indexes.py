@@ -0,0 +1,65 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0008_unique_active_application"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="application",
+            name="queue",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="applications",
+                to="core.queue",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="application",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="applications",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="form",
+            name="application",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="forms",
+                to="core.application",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lodgement",
+            name="queue",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="lodgements",
+                to="core.queue",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="scoringformlog",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="scoring_form_logs",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -1,11 +1,29 @@
+import time
 from datetime import datetime
-from functools import cached_property
 
-from django.db import models
+from django.db import connections, models, transaction
 from dateutil.relativedelta import relativedelta
-from django.db.models import Q, Case, When, BooleanField, Value, OuterRef, Subquery
+from django.db.models import (
+    Q,
+    F,
+    Case,
+    When,
+    BooleanField,
+    BigIntegerField,
+    IntegerField,
+    Value,
+    OuterRef,
+    Subquery,
+    Exists,
+    FilteredRelation,
+    ExpressionWrapper,
+    Sum,
+    Window,
+)
+from django.db.models.fields.json import KT
+from django.db.models.lookups import LessThanOrEqual
+from django.db.models.functions import Abs, Cast, Coalesce, ExtractYear, Rank, RowNumber
 from django.utils import timezone
-import bisect
 import numpy as np
 
 from authentication.models import User
@@ -20,7 +38,109 @@ from core.constants import (
     LodgementType,
     AssignmentStatus,
     LodgementSizes,
+    MAX_INTEGER_ANSWER,
 )
+from core.priority import from_epoch, priority_queues
+
+
+def years_since(field, now):
+    """
+    SQL counterpart of ``relativedelta(now, <field>).years``.
+    """
+    anniversary_pending = (
+        Q(**{f"{field}__month__gt": now.month})
+        | Q(**{f"{field}__month": now.month, f"{field}__day__gt": now.day})
+        | Q(
+            **{
+                f"{field}__month": now.month,
+                f"{field}__day": now.day,
+                f"{field}__time__gt": now.time(),
+            }
+        )
+    )
+    return ExpressionWrapper(
+        Value(now.year)
+        - ExtractYear(field)
+        - Case(When(anniversary_pending, then=Value(1)), default=Value(0)),
+        output_field=IntegerField(),
+    )
+
+
+def earned_points():
+    """
+    SQL counterpart of ``FormItem.earned_points``.
+
+    Integer answers above ``MAX_INTEGER_ANSWER`` earn nothing, the same as in
+    Python, so the sums always fit ``Form.base_points``.
+    """
+    answer = Cast(KT("answer__value"), BigIntegerField())
+    integer_answer = Case(
+        When(answer__value=True, then=Value(1)),
+        When(
+            # The digit limit keeps the cast itself from overflowing.
+            answer__value__regex=(
+                rf"^\s*[-+]?0*[0-9]{{1,{len(str(MAX_INTEGER_ANSWER))}}}\s*$"
+            ),
+            then=Case(
+                When(LessThanOrEqual(Abs(answer), MAX_INTEGER_ANSWER), then=answer),
+                default=Value(0),
+            ),
+        ),
+        default=Value(0),
+        output_field=BigIntegerField(),
+    )
+    falsy_answer = (
+        Q(answer__value__isnull=True)
+        | Q(answer__value=None)
+        | Q(answer__value=False)
+        | Q(answer__value=0)
+        | Q(answer__value="")
+    )
+    return Case(
+        When(Q(point__isnull=True) | Q(answer__isnull=True), then=Value(0)),
+        When(
+            field_type=FormItemTypes.INTEGER,
+            then=ExpressionWrapper(
+                F("point") * integer_answer, output_field=BigIntegerField()
+            ),
+        ),
+        When(Q(field_type=FormItemTypes.BOOLEAN) & falsy_answer, then=Value(0)),
+        When(field_type=FormItemTypes.BOOLEAN, then=F("point")),
+        default=Value(0),
+        output_field=BigIntegerField(),
+    )
+
+
+def live_base_points(form):
+    """
+    Sum of the earned points of the items of ``form``, an outer reference to a
+    form's primary key.
+    """
+    items = (
+        FormItem.objects.filter(form=form)
+        .order_by()
+        .values("form")
+        .annotate(points=Sum(earned_points()))
+        .values("points")
+    )
+    return Coalesce(Subquery(items), Value(0), output_field=IntegerField())
+
+
+def violates_constraint(error, model, name):
+    """
+    Whether the IntegrityError ``error`` was raised by the unique constraint
+    ``name`` of ``model``.
+    """
+    diag = getattr(error.__cause__, "diag", None)
+    if diag is not None:
+        return diag.constraint_name == name
+    # SQLite names the columns instead of the constraint.
+    constraint = next(c for c in model._meta.constraints if c.name == name)
+    columns = ", ".join(
+        f"{model._meta.db_table}.{model._meta.get_field(field).column}"
+        for field in constraint.fields
+    )
+    return str(error) == f"UNIQUE constraint failed: {columns}"
 
 
 class BaseModel(models.Model):
@@ -39,10 +159,18 @@ class Lodgement(BaseModel):
     location = models.CharField(max_length=255)
     is_available = models.BooleanField(default=True)
     busy_until = models.DateTimeField(null=True, blank=True)
+    # Indexed by lodgement_queue_busy_idx.
     queue = models.ForeignKey(
-        "Queue", on_delete=models.CASCADE, related_name="lodgements"
+        "Queue", on_delete=models.CASCADE, related_name="lodgements", db_index=False
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["queue", "busy_until"], name="lodgement_queue_busy_idx"
+            ),
+        ]
+
 
 class Document(BaseModel):
     name = models.TextField()
@@ -50,41 +178,191 @@ class Document(BaseModel):
     pdf_file = models.FileField(upload_to="documents/", null=True, blank=True)
 
 
+class ApplicationQuerySet(models.QuerySet):
+    def with_total_points(self, live=False):
+        now = timezone.localtime()
+        if live:
+            base_points = live_base_points(OuterRef("scoring__pk"))
+        else:
+            base_points = F("scoring__base_points")
+        return self.annotate(
+            scoring=FilteredRelation(
+                "forms", condition=Q(forms__type=FormType.SCORING)
+            ),
+        ).annotate(
+            total_points=base_points + years_since("scoring__created_at", now),
+        )
+
+    def by_priority(self):
+        return self.with_total_points().order_by("-total_points", "id")
+
+    def with_queue_positions(self):
+        """
+        Approved applications among these with their ``queue_rank`` (ties
+        share a rank) and 1-based ``queue_position`` in their queue, and the
+        lodgement at that position by busy_until with its
+        ``estimated_availability``. Runs as a single statement and returns a
+        list ordered by queue and position.
+        """
+        ranked = (
+            self.filter(status=ApplicationStatus.APPROVED)
+            .with_total_points()
+            .annotate(
+                queue_rank=Window(
+                    Rank(),
+                    partition_by=F("queue_id"),
+                    order_by=F("total_points").desc(),
+                ),
+                queue_position=Window(
+                    RowNumber(),
+                    partition_by=F("queue_id"),
+                    order_by=[F("total_points").desc(), F("id").asc()],
+                ),
+            )
+            .order_by()
+        )
+        slots = (
+            Lodgement.objects.filter(
+                queue_id__in=self.filter(status=ApplicationStatus.APPROVED).values(
+                    "queue_id"
+                )
+            )
+            .annotate(
+                slot=Window(
+                    RowNumber(),
+                    partition_by=F("queue_id"),
+                    order_by=[F("busy_until").asc(nulls_first=True), F("id").asc()],
+                )
+            )
+            .values("id", "queue_id", "busy_until", "slot")
+            .order_by()
+        )
+        connection = connections[self.db]
+        ranked_sql, ranked_params = ranked.query.get_compiler(self.db).as_sql()
+        slots_sql, slots_params = slots.query.get_compiler(self.db).as_sql()
+        applications = list(
+            self.raw(
+                f"""
+                WITH ranked AS ({ranked_sql}), slots AS ({slots_sql})
+                SELECT ranked.*,
+                       slots.id AS slot_lodgement_id,
+                       slots.busy_until AS slot_busy_until
+                FROM ranked
+                LEFT JOIN slots
+                  ON slots.queue_id = ranked.queue_id
+                 AND slots.slot = ranked.queue_position
+                ORDER BY ranked.queue_id, ranked.queue_position
+                """,
+                ranked_params + slots_params,
+                using=self.db,
+            )
+        )
+
+        # Raw annotations skip the backend's converters, e.g. SQLite returns
+        # datetimes as strings.
+        column = Lodgement._meta.get_field("busy_until").get_col("slots")
+        converters = connection.ops.get_db_converters(column)
+        now = timezone.now()
+        for application in applications:
+            busy_until = application.slot_busy_until
+            for converter in converters:
+                busy_until = converter(busy_until, column, connection)
+            if application.slot_lodgement_id is None:
+                application.estimated_availability = None
+            else:
+                application.estimated_availability = busy_until or now
+        return applications
+
+    def with_details(self):
+        """Loads everything ApplicationSerializer reads."""
+        return self.select_related("user", "queue").prefetch_related(
+            "queue__required_documents",
+            "documents__document",
+            "forms__items",
+        )
+
+
 class Application(BaseModel):
+    # Indexed by application_user_queue_idx and application_queue_status_idx.
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="applications"
+        User, on_delete=models.CASCADE, related_name="applications", db_index=False
     )
     status = models.IntegerField(choices=ApplicationStatus.choices)
     queue = models.ForeignKey(
-        "Queue", on_delete=models.CASCADE, related_name="applications"
+        "Queue", on_delete=models.CASCADE, related_name="applications", db_index=False
     )
     system_message = models.TextField(null=True, blank=True)
 
+    objects = ApplicationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["queue", "status"], name="application_queue_status_idx"
+            ),
+            models.Index(
+                fields=["user", "queue", "status"], name="application_user_queue_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "queue"],
+                condition=~Q(
+                    status__in=[ApplicationStatus.CANCELLED, ApplicationStatus.REJECTED]
+                ),
+                name="unique_active_application",
+            ),
+        ]
+
     @property
     def scoring_form(self):
+        if "forms" in getattr(self, "_prefetched_objects_cache", {}):
+            forms = [form for form in self.forms.all() if form.type == FormType.SCORING]
+            return min(forms, key=lambda form: form.pk, default=None)
         return self.forms.filter(type=FormType.SCORING).first()
 
 
+class FormQuerySet(models.QuerySet):
+    def with_live_base_points(self):
+        return self.annotate(live_base_points=live_base_points(OuterRef("pk")))
+
+    def refresh_base_points(self):
+        return self.update(base_points=live_base_points(OuterRef("pk")))
+
+    def stale_base_points(self):
+        return self.with_live_base_points().exclude(base_points=F("live_base_points"))
+
+
 class Form(BaseModel):
     type = models.IntegerField(choices=FormType.choices)
+    # Indexed by form_application_type_idx.
     application = models.ForeignKey(
-        "Application", on_delete=models.CASCADE, related_name="forms"
+        "Application", on_delete=models.CASCADE, related_name="forms", db_index=False
     )
+    # Sum of the answered item points, kept in sync with the items so queues
+    # can be ordered in the database. Years waited is added on top at read time.
+    base_points = models.IntegerField(default=0)
+
+    objects = FormQuerySet.as_manager()
 
-    @cached_property
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["application", "type"], name="form_application_type_idx"
+            ),
+        ]
+
+    @property
+    def years_waited(self):
+        return relativedelta(timezone.now(), self.created_at).years
+
+    @property
     def total_points(self):
-        items = self.items.all()
-        s = 0
-        for item in items:
-            if item.point:
-                if item.field_type == FormItemTypes.INTEGER:
-                    s += item.point * item.answer_value if item.answer_value else 0
-                elif item.field_type == FormItemTypes.BOOLEAN:
-                    s += item.point if item.answer_value else 0
-        years_waited = relativedelta(
-            datetime.now(), self.created_at.replace(tzinfo=None)
-        ).years
-        return s + years_waited
+        return self.base_points + self.years_waited
+
+    def refresh_base_points(self):
+        Form.objects.filter(pk=self.pk).refresh_base_points()
+        self.refresh_from_db(fields=["base_points"])
 
 
 class FormItem(BaseModel):
@@ -104,9 +382,12 @@ class FormItem(BaseModel):
 
         if self.field_type == FormItemTypes.INTEGER:
             try:
-                return int(value)
+                value = int(value)
             except (TypeError, ValueError):
                 return None
+            if abs(value) > MAX_INTEGER_ANSWER:
+                return None
+            return value
         elif self.field_type == FormItemTypes.BOOLEAN:
             return bool(value)
         elif self.field_type == FormItemTypes.TEXT:
@@ -114,6 +395,16 @@ class FormItem(BaseModel):
 
         return None
 
+    @property
+    def earned_points(self):
+        if not self.point or not self.answer_value:
+            return 0
+        if self.field_type == FormItemTypes.INTEGER:
+            return self.point * self.answer_value
+        elif self.field_type == FormItemTypes.BOOLEAN:
+            return self.point
+        return 0
+
 
 class ApplicationDocument(BaseModel):
     document = models.ForeignKey(
@@ -139,289 +430,230 @@ class Queue(BaseModel):
         return f"{LodgementType.choices[self.lodgement_type - 1][1]} - {PersonalType.choices[self.personel_type - 1][1]} - {LodgementSize.choices[self.lodgement_size - 1][1]}"
 
     def get_priority_queue(self, new_application=None, new_application_points=None):
-        applications = list(self.applications.filter(status=ApplicationStatus.APPROVED))
-        # Sort applications in Python based on the scoring_form property
-        applications.sort(key=lambda x: x.scoring_form.total_points, reverse=True)
-
-        if new_application is not None and new_application_points is not None:
-            points_list = [app.scoring_form.total_points for app in applications]
-            # Find the position where the new application should be inserted
-            position = bisect.bisect_right(
-                [-points for points in points_list], -new_application_points
+        snapshot = priority_queues.get(self)
+        applications = self.applications.in_bulk(snapshot.application_ids.tolist())
+        lodgements = self.lodgements.in_bulk(snapshot.lodgement_ids.tolist())
+
+        entries = [
+            (applications[application_id], points)
+            for application_id, points in zip(
+                snapshot.application_ids.tolist(), snapshot.points.tolist()
             )
-            # Insert the new application at the correct position
-            applications.insert(position, new_application)
-
-        lodgements = self.lodgements.order_by("busy_until")
-        available_lodgements = lodgements.filter(busy_until__isnull=True)
-        busy_lodgements = lodgements.filter(busy_until__isnull=False)
+        ]
+        if new_application is not None and new_application_points is not None:
+            position = snapshot.insert_position(new_application_points)
+            entries.insert(position, (new_application, new_application_points))
 
         today = timezone.now()
-        availability_queue = []
-
-        # Assign immediate availability to applications if there are available lodgements
-        for application in applications:
-            if available_lodgements:
-                lodgement = available_lodgements[0]
-                availability_queue.append(
-                    {
-                        "application": application,
-                        "total_points": application.scoring_form.total_points
-                        if application.id != -1
-                        else new_application_points,
-                        "estimated_availability_date": today,
-                        "lodgement": lodgement,
-                    }
-                )
-                available_lodgements = available_lodgements[
-                    1:
-                ]  # Move to the next available lodgement
-            else:
-                # If no available lodgements, assign based on the earliest busy_until
-                if busy_lodgements:
-                    earliest_busy = busy_lodgements[0]
-                    availability_queue.append(
-                        {
-                            "application": application,
-                            "total_points": application.scoring_form.total_points
-                            if application.id != -1
-                            else new_application_points,
-                            "estimated_availability_date": earliest_busy.busy_until,
-                            "lodgement": earliest_busy,
-                        }
-                    )
-                    busy_lodgements = busy_lodgements[
-                        1:
-                    ]  # Move to the next busy lodgement
-                else:
-                    availability_queue.append(
-                        {
-                            "application": application,
-                            "total_points": application.scoring_form.total_points
-                            if application.id != -1
-                            else new_application_points,
-                            "estimated_availability_date": None,
-                            "lodgement": None,
-                        }
-                    )
-
-        return availability_queue
+        dates = snapshot.availability_epochs(len(entries), now=today)
+        return [
+            {
+                "application": application,
+                "total_points": points,
+                "estimated_availability_date": from_epoch(date),
+                "lodgement": lodgements.get(snapshot.lodgement_at(position)),
+            }
+            for position, ((application, points), date) in enumerate(
+                zip(entries, dates.tolist())
+            )
+        ]
 
     def assign(self, application, lodgement):
-        today = timezone.now().date()
-        thirty_days_later = today + timezone.timedelta(days=30)
-        assignment = Assignment(
-            application=application,
-            lodgement=lodgement,
-            start_date=thirty_days_later,
-            end_date=thirty_days_later + timezone.timedelta(days=365 * 5),
-            status=AssignmentStatus.LOCKED,
-        )
-        assignment.save()
-        lodgement.busy_until = assignment.end_date
-        lodgement.save()
-        application.status = ApplicationStatus.ASSIGNED
-        application.save()
+        return self.assign_many([(application, lodgement)])[0]
+
+    def assignment_period(self, now=None):
+        now = timezone.now() if now is None else now
+        start_date = now.date() + timezone.timedelta(days=30)
+        return start_date, start_date + timezone.timedelta(days=365 * 5)
+
+    def assign_many(self, assignments):
+        """
+        Locks every (application, lodgement) pair in ``assignments`` for five
+        years starting thirty days from today, all or nothing.
+        """
+        now = timezone.now()
+        start_date, end_date = self.assignment_period(now)
+
+        rows = []
+        for application, lodgement in assignments:
+            rows.append(
+                Assignment(
+                    application=application,
+                    lodgement=lodgement,
+                    start_date=start_date,
+                    end_date=end_date,
+                    status=AssignmentStatus.LOCKED,
+                )
+            )
+            lodgement.busy_until = end_date
+            lodgement.updated_at = now
+            application.status = ApplicationStatus.ASSIGNED
+            application.updated_at = now
+
+        with transaction.atomic():
+            Assignment.objects.bulk_create(rows)
+            Lodgement.objects.bulk_update(
+                [lodgement for _, lodgement in assignments],
+                ["busy_until", "updated_at"],
+            )
+            Application.objects.bulk_update(
+                [application for application, _ in assignments],
+                ["status", "updated_at"],
+            )
+            priority_queues.invalidate(
+                self.id, *(lodgement.queue_id for _, lodgement in assignments)
+            )
+        return rows
 
-    def assignment_pipeline(self):
+    def plan_assignments(self):
         if self.lodgement_type == LodgementType.SERVICE_ALLOCATION:
             # Service allocation will be handled manually by manager
-            pass
+            return []
         elif self.lodgement_type == LodgementType.DUTY_ALLOCATION:
-            self.make_assignments_default()
+            return self.plan_assignments_default()
         elif self.lodgement_type == LodgementType.SEQUENTIAL_ALLOCATION:
             if self.personel_type == PersonalType.ACADEMIC:
-                self.make_assignments_academic()
+                return self.plan_assignments_academic()
             elif self.personel_type == PersonalType.ADMINISTRATIVE:
-                self.make_assignments_default()
+                return self.plan_assignments_default()
+        return []
 
-    def make_assignments_default(self):
-        applications = list(self.applications.filter(status=ApplicationStatus.APPROVED))
-        applications.sort(key=lambda x: x.scoring_form.total_points, reverse=True)
+    def assignment_pipeline(self):
+        with transaction.atomic():
+            # Locking the queue serialises pipeline runs for the same queue, so
+            # two runs cannot hand out the same lodgement.
+            Queue.objects.select_for_update().get(pk=self.pk)
+            return self.assign_many(self.plan_assignments())
+
+    def simulate_assignments(self):
+        """
+        Runs the assignment pipeline without writing anything and returns the
+        planned (application, lodgement, start_date) tuples with its duration.
+        """
+        started = time.perf_counter()
+        planned = self.plan_assignments()
+        start_date, _ = self.assignment_period()
+        return {
+            "assignments": [
+                (application, lodgement, start_date)
+                for application, lodgement in planned
+            ],
+            "elapsed": time.perf_counter() - started,
+        }
+
+    def plan_assignments_default(self):
+        applications = self.applications.filter(
+            status=ApplicationStatus.APPROVED
+        ).by_priority()
 
         today = timezone.now().date()
         thirty_days_later = today + timezone.timedelta(days=30)
-        lodgements = list(
-            self.lodgements.filter(
-                Q(busy_until__isnull=True) | Q(busy_until__lte=thirty_days_later)
-            ).order_by("busy_until")
-        )
+        lodgements = self.lodgements.filter(
+            Q(busy_until__isnull=True) | Q(busy_until__lte=thirty_days_later)
+        ).order_by("busy_until")
 
-        while applications and lodgements:
-            application = applications.pop(0)
-            lodgement = lodgements.pop(0)
-            self.assign(application, lodgement)
+        return list(zip(applications, lodgements))
 
-    def make_assignments_academic(self):
-        today = timezone.now().date()
-        thirty_days_later = today + timezone.timedelta(days=30)
-        threshold_date = datetime.now() - relativedelta(years=3)
-        all_lodgements = list(self.lodgements.all())
+    def make_assignments_default(self):
+        return self.assign_many(self.plan_assignments_default())
 
-        active_assignment_subquery = Assignment.objects.filter(
+    def with_tenant_is_new(self, lodgements, threshold_date):
+        active_assignments = Assignment.objects.filter(
             lodgement=OuterRef("pk"),
             status__in=[AssignmentStatus.ACTIVE, AssignmentStatus.LOCKED],
-        ).values("application__user__start_of_employment")[:1]
-
-        # Annotate lodgements with is_new field
-        assigned_lodgements = self.lodgements.annotate(
-            start_of_employment=Subquery(active_assignment_subquery),
+        )
+        return lodgements.annotate(
+            start_of_employment=Subquery(
+                active_assignments.values("application__user__start_of_employment")[:1]
+            ),
+            has_tenant=Exists(active_assignments),
             is_new=Case(
                 When(start_of_employment__gte=threshold_date, then=Value(True)),
                 default=Value(False),
                 output_field=BooleanField(),
             ),
-        ).filter(busy_until__gte=thirty_days_later)
+        )
 
-        new_academic_lodgements = [
-            lodgement for lodgement in assigned_lodgements if lodgement.is_new
-        ]
-        print("New academic lodgements", new_academic_lodgements)
-        old_academic_lodgements = [
-            lodgement for lodgement in assigned_lodgements if not lodgement.is_new
-        ]
-        print("Old academic lodgements", old_academic_lodgements)
+    def plan_assignments_academic(self):
+        """
+        Pairs approved academics with assignable lodgements, keeping the share
+        of lodgements held by new academics (employed for less than three
+        years) close to 80%.
+        """
+        today = timezone.now().date()
+        thirty_days_later = today + timezone.timedelta(days=30)
+        threshold_date = datetime.now() - relativedelta(years=3)
+        lodgement_count = self.lodgements.count()
+
+        assigned_lodgements = self.with_tenant_is_new(
+            self.lodgements.filter(busy_until__gte=thirty_days_later), threshold_date
+        ).values_list("is_new", flat=True)
+        new_count = 0
+        old_count = 0
+        for is_new in assigned_lodgements:
+            if is_new:
+                new_count += 1
+            else:
+                old_count += 1
 
-        assignable_lodgements = list(
+        assignable_lodgements = self.with_tenant_is_new(
             self.lodgements.filter(
                 Q(busy_until__isnull=True) | Q(busy_until__lte=thirty_days_later)
-            ).order_by("busy_until")
+            ).order_by("busy_until"),
+            threshold_date,
         )
-        print("Assignable lodgements", assignable_lodgements)
 
-        new_academic_applications = list(
+        applications = (
             self.applications.filter(
-                Q(
-                    user__start_of_employment__gte=datetime.now()
-                    - relativedelta(years=3)
-                )
-                & Q(status=ApplicationStatus.APPROVED)
+                status=ApplicationStatus.APPROVED,
+                user__start_of_employment__isnull=False,
             )
+            .select_related("user")
+            .by_priority()
         )
-        new_academic_applications.sort(
-            key=lambda x: x.scoring_form.total_points, reverse=True
-        )
-        print("New academic applications", new_academic_applications)
-
-        old_academic_applications = list(
-            self.applications.filter(
-                Q(user__start_of_employment__lt=datetime.now() - relativedelta(years=3))
-                & Q(status=ApplicationStatus.APPROVED)
-            )
-        )
-        old_academic_applications.sort(
-            key=lambda x: x.scoring_form.total_points, reverse=True
-        )
-        print("Old academic applications", old_academic_applications)
+        new_academic_applications = []
+        old_academic_applications = []
+        for application in applications:
+            if application.user.start_of_employment >= threshold_date.date():
+                new_academic_applications.append(application)
+            else:
+                old_academic_applications.append(application)
 
-        desired_vector = np.array(
-            [0.8 * len(all_lodgements), 0.2 * len(all_lodgements)]
-        )
-        while assignable_lodgements and (
-            new_academic_applications or old_academic_applications
-        ):
-            lodgement = assignable_lodgements.pop(0)
+        desired_vector = np.array([0.8 * lodgement_count, 0.2 * lodgement_count])
+        assignments = []
+        for lodgement in assignable_lodgements:
+            if not new_academic_applications and not old_academic_applications:
+                break
 
-            new_academic_assignment_vector = np.array(
-                [len(new_academic_lodgements) + 1, len(old_academic_lodgements)]
-            )
+            new_academic_assignment_vector = np.array([new_count + 1, old_count])
+            old_academic_assignment_vector = np.array([new_count, old_count + 1])
+            prefer_new = np.linalg.norm(
+                new_academic_assignment_vector - desired_vector
+            ) < np.linalg.norm(old_academic_assignment_vector - desired_vector)
 
-            old_academic_assignment_vector = np.array(
-                [len(new_academic_lodgements), len(old_academic_lodgements) + 1]
-            )
+            if (
+                prefer_new and new_academic_applications
+            ) or not old_academic_applications:
+                application = new_academic_applications.pop(0)
+                is_new = True
+            else:
+                application = old_academic_applications.pop(0)
+                is_new = False
+            assignments.append((application, lodgement))
+
+            # A lodgement keeps counting for its current tenant until their
+            # assignment ends.
+            if lodgement.has_tenant:
+                is_new = lodgement.is_new
+            if is_new:
+                new_count += 1
+            else:
+                old_count += 1
 
-            print(
-                "Vector difference to desired vector if new academic is selected",
-                np.linalg.norm(new_academic_assignment_vector - desired_vector),
-            )
-            print(
-                "Vector difference to desired vector if old academic is selected",
-                np.linalg.norm(old_academic_assignment_vector - desired_vector),
-            )
+        return assignments
 
-            if np.linalg.norm(
-                new_academic_assignment_vector - desired_vector
-            ) < np.linalg.norm(old_academic_assignment_vector - desired_vector):
-                if new_academic_applications:
-                    print("New academic is selected")
-                    application = new_academic_applications.pop(0)
-                    self.assign(application, lodgement)
-                else:
-                    print(
-                        "Old academic is selected since there are no new academic applications"
-                    )
-                    application = old_academic_applications.pop(0)
-                    self.assign(application, lodgement)
-            else:
-                if old_academic_applications:
-                    print("Old academic is selected")
-                    application = old_academic_applications.pop(0)
-                    self.assign(application, lodgement)
-                else:
-                    print(
-                        "New academic is selected since there are no old academic applications"
-                    )
-                    application = new_academic_applications.pop(0)
-                    self.assign(application, lodgement)
-
-            active_assignment_subquery = Assignment.objects.filter(
-                lodgement=OuterRef("pk"),
-                status__in=[AssignmentStatus.ACTIVE, AssignmentStatus.LOCKED],
-            ).values("application__user__start_of_employment")[:1]
-
-            # Annotate lodgements with is_new field
-            assigned_lodgements = self.lodgements.annotate(
-                start_of_employment=Subquery(active_assignment_subquery),
-                is_new=Case(
-                    When(start_of_employment__gte=threshold_date, then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField(),
-                ),
-            ).filter(busy_until__gte=thirty_days_later)
-
-            new_academic_lodgements = [
-                lodgement for lodgement in assigned_lodgements if lodgement.is_new
-            ]
-            print("New academic lodgements", new_academic_lodgements)
-            old_academic_lodgements = [
-                lodgement for lodgement in assigned_lodgements if not lodgement.is_new
-            ]
-            print("Old academic lodgements", old_academic_lodgements)
-
-            assignable_lodgements = list(
-                self.lodgements.filter(
-                    Q(busy_until__isnull=True) | Q(busy_until__lte=thirty_days_later)
-                ).order_by("busy_until")
-            )
-            print("Assignable lodgements", assignable_lodgements)
-
-            new_academic_applications = list(
-                self.applications.filter(
-                    Q(
-                        user__start_of_employment__gte=datetime.now()
-                        - relativedelta(years=3)
-                    )
-                    & Q(status=ApplicationStatus.APPROVED)
-                )
-            )
-            new_academic_applications.sort(
-                key=lambda x: x.scoring_form.total_points, reverse=True
-            )
-            print("New academic applications", new_academic_applications)
-
-            old_academic_applications = list(
-                self.applications.filter(
-                    Q(
-                        user__start_of_employment__lt=datetime.now()
-                        - relativedelta(years=3)
-                    )
-                    & Q(status=ApplicationStatus.APPROVED)
-                )
-            )
-            old_academic_applications.sort(
-                key=lambda x: x.scoring_form.total_points, reverse=True
-            )
-            print("Old academic applications", old_academic_applications)
+    def make_assignments_academic(self):
+        return self.assign_many(self.plan_assignments_academic())
 
 
 class Assignment(BaseModel):
@@ -447,16 +679,33 @@ class ScoringFormItem(models.Model):
 
 class ScoringFormLog(models.Model):
     data = models.JSONField()
+    # Indexed by scoringformlog_user_id_idx.
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="scoring_form_logs"
+        User, on_delete=models.CASCADE, related_name="scoring_form_logs", db_index=False
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"], name="scoringformlog_user_id_idx"),
+        ]
+
 
 class Announcement(BaseModel):
     title = models.CharField(max_length=200)
     content = models.TextField()
     is_visible = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Partial, Django compiles is_visible=True to a bare boolean that a
+            # (is_visible, created_at) index cannot be searched with.
+            models.Index(
+                fields=["-created_at"],
+                condition=Q(is_visible=True),
+                name="announcement_visible_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -0,0 +1,383 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.constants import ApplicationStatus
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Marks lodgements without busy_until, they are available right away.
+AVAILABLE = np.iinfo(np.int64).min
+# Marks positions that no lodgement is expected to become available for.
+UNAVAILABLE = np.iinfo(np.int64).max
+
+
+def to_epoch(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_epoch(value):
+    if value == UNAVAILABLE:
+        return None
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def next_anniversary(created_at, now):
+    """
+    First moment after ``now`` at which ``years_since(created_at)`` goes up.
+    An anniversary on 29 February falls on 1 March in other years.
+    """
+    created_at = timezone.localtime(created_at)
+    for year in range(now.year, now.year + 2):
+        try:
+            anniversary = created_at.replace(year=year)
+        except ValueError:
+            anniversary = created_at.replace(
+                year=year, month=3, day=1, hour=0, minute=0, second=0, microsecond=0
+            )
+        if anniversary > now:
+            return anniversary
+
+
+def anniversary_epoch(created_at, now):
+    if created_at is None:
+        return UNAVAILABLE
+    return to_epoch(next_anniversary(created_at, now))
+
+
+class PriorityQueueSnapshot:
+    """
+    Approved applications of a queue in priority order together with the
+    lodgements they are expected to move into, held in NumPy arrays.
+
+    The n-th application gets the n-th lodgement, lodgements without a
+    busy_until date first and then the busy ones by busy_until.
+    """
+
+    def __init__(
+        self,
+        queue_id,
+        application_ids,
+        user_ids,
+        points,
+        lodgement_ids,
+        lodgement_busy_until,
+        anniversaries=(),
+    ):
+        self.queue_id = queue_id
+        self.application_ids = np.asarray(application_ids, dtype=np.int64)
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.points = np.asarray(points, dtype=np.int64)
+        self.lodgement_ids = np.asarray(lodgement_ids, dtype=np.int64)
+        self.lodgement_busy_until = np.asarray(lodgement_busy_until, dtype=np.int64)
+        # Next date on which each application's points gain a year.
+        self.anniversaries = np.asarray(anniversaries, dtype=np.int64)
+        # When the points stop being accurate, None if they never do.
+        self.expires_at = (
+            from_epoch(self.anniversaries.min()) if len(self.anniversaries) else None
+        )
+
+    @classmethod
+    def for_queue(cls, queue):
+        return cls.for_queues([queue])[queue.id]
+
+    @classmethod
+    def for_queues(cls, queues):
+        """
+        Snapshots of every queue in ``queues`` keyed by queue id, loaded with
+        two queries however many queues there are.
+        """
+        from core.models import Application, Lodgement
+
+        now = timezone.localtime()
+        queue_ids = {queue.id for queue in queues}
+        applications = {queue_id: [] for queue_id in queue_ids}
+        for queue_id, *application in (
+            Application.objects.filter(
+                queue_id__in=queue_ids, status=ApplicationStatus.APPROVED
+            )
+            .by_priority()
+            .values_list(
+                "queue_id", "id", "user_id", "total_points", "scoring__created_at"
+            )
+        ):
+            applications[queue_id].append(application)
+        lodgements = {queue_id: [] for queue_id in queue_ids}
+        for queue_id, *lodgement in (
+            Lodgement.objects.filter(queue_id__in=queue_ids)
+            .order_by(F("busy_until").asc(nulls_first=True), "id")
+            .values_list("queue_id", "id", "busy_until")
+        ):
+            lodgements[queue_id].append(lodgement)
+
+        return {
+            queue_id: cls(
+                queue_id,
+                [application[0] for application in applications[queue_id]],
+                [application[1] for application in applications[queue_id]],
+                [application[2] for application in applications[queue_id]],
+                [lodgement[0] for lodgement in lodgements[queue_id]],
+                [
+                    AVAILABLE if busy_until is None else to_epoch(busy_until)
+                    for _, busy_until in lodgements[queue_id]
+                ],
+                [
+                    anniversary_epoch(application[3], now)
+                    for application in applications[queue_id]
+                ],
+            )
+            for queue_id in queue_ids
+        }
+
+    def replace(self, keep=None, **inserts):
+        """
+        Copy with only the applications at positions ``keep`` and, if given,
+        one application inserted at ``inserts["position"]``.
+        """
+        columns = [self.application_ids, self.user_ids, self.points, self.anniversaries]
+        if keep is not None:
+            columns = [column[keep] for column in columns]
+        if inserts:
+            position = inserts.pop("position")
+            columns = [
+                np.insert(column, position, inserts[name])
+                for column, name in zip(
+                    columns, ["application_id", "user_id", "points", "anniversary"]
+                )
+            ]
+        application_ids, user_ids, points, anniversaries = columns
+        return PriorityQueueSnapshot(
+            self.queue_id,
+            application_ids,
+            user_ids,
+            points,
+            self.lodgement_ids,
+            self.lodgement_busy_until,
+            anniversaries,
+        )
+
+    def without(self, application_id):
+        return self.replace(keep=self.application_ids != application_id)
+
+    def with_application(self, application_id, user_id, points, anniversary):
+        """
+        Copy with the application moved to, or added at, the place
+        ``points`` gives it: ahead of lower points, among equal points by id.
+        """
+        snapshot = self.without(application_id)
+        start = int(np.searchsorted(-snapshot.points, -points, side="left"))
+        end = int(np.searchsorted(-snapshot.points, -points, side="right"))
+        position = start + int(
+            np.searchsorted(snapshot.application_ids[start:end], application_id)
+        )
+        return snapshot.replace(
+            position=position,
+            application_id=application_id,
+            user_id=user_id,
+            points=points,
+            anniversary=anniversary,
+        )
+
+    def __len__(self):
+        return len(self.application_ids)
+
+    def insert_position(self, points):
+        """
+        Position a new application with ``points`` would take, after the
+        applications with the same points.
+        """
+        return int(np.searchsorted(-self.points, -points, side="right"))
+
+    def rank(self, points, exclude_user_id=None):
+        """
+        1-based rank of ``points`` among the approved applications, ignoring
+        the applications of ``exclude_user_id``.
+        """
+        ahead = int(np.searchsorted(-self.points, -points, side="left"))
+        if exclude_user_id is not None:
+            ahead -= int(np.count_nonzero(self.user_ids[:ahead] == exclude_user_id))
+        return ahead + 1
+
+    def position_of(self, application_id):
+        positions = np.flatnonzero(self.application_ids == application_id)
+        return int(positions[0]) if len(positions) else None
+
+    def lodgement_at(self, position):
+        if position is None or position >= len(self.lodgement_ids):
+            return None
+        return int(self.lodgement_ids[position])
+
+    def availability_epochs(self, count=None, now=None):
+        """
+        Estimated availability of every position up to ``count`` as epoch
+        microseconds, ``UNAVAILABLE`` where no lodgement is left.
+        """
+        count = len(self) if count is None else count
+        now = timezone.now() if now is None else now
+        epochs = np.full(count, UNAVAILABLE, dtype=np.int64)
+        filled = min(count, len(self.lodgement_busy_until))
+        slots = self.lodgement_busy_until[:filled]
+        epochs[:filled] = np.where(slots == AVAILABLE, to_epoch(now), slots)
+        return epochs
+
+    def availability_at(self, position, now=None):
+        if position is None or position >= len(self.lodgement_busy_until):
+            return None
+        busy_until = self.lodgement_busy_until[position]
+        if busy_until == AVAILABLE:
+            return timezone.now() if now is None else now
+        return from_epoch(busy_until)
+
+    def availability_for(self, application_id, now=None):
+        return self.availability_at(self.position_of(application_id), now=now)
+
+    def hypothetical_availability(self, points, now=None):
+        return self.availability_at(self.insert_position(points), now=now)
+
+
+class PriorityQueueSnapshotCache:
+    """
+    Shares snapshots between workers through Django's cache.
+
+    Every queue has a version counter, snapshots are stored under the current
+    version and ``invalidate`` bumps it. The bump is repeated once the
+    transaction commits, dropping any snapshot another worker built from the
+    data as it was before the commit. Snapshots also expire on the next
+    anniversary in the queue, when the years-waited part of a score changes,
+    and after ``PRIORITY_QUEUE_CACHE_TIMEOUT`` seconds at the latest, which
+    covers writes from processes that don't share the cache.
+    """
+
+    @property
+    def max_timeout(self):
+        return getattr(settings, "PRIORITY_QUEUE_CACHE_TIMEOUT", 60 * 60)
+
+    def version_key(self, queue_id):
+        return f"priority-queue:{queue_id}:version"
+
+    def snapshot_key(self, queue_id, version):
+        return f"priority-queue:{queue_id}:{version}"
+
+    def get_versions(self, queue_ids):
+        keys = {queue_id: self.version_key(queue_id) for queue_id in queue_ids}
+        versions = cache.get_many(keys.values())
+        missing = [key for key in keys.values() if key not in versions]
+        if missing:
+            # Starting from the clock keeps a lost counter from reusing the
+            # versions of snapshots that are still cached.
+            for key in missing:
+                cache.add(key, time.time_ns(), timeout=None)
+            versions.update(cache.get_many(missing))
+        return {queue_id: versions[key] for queue_id, key in keys.items()}
+
+    def get_many(self, queues):
+        """Snapshots of every queue in ``queues`` keyed by queue id."""
+        queue_ids = {queue.id for queue in queues}
+        keys = {
+            queue_id: self.snapshot_key(queue_id, version)
+            for queue_id, version in self.get_versions(queue_ids).items()
+        }
+        now = timezone.now()
+        cached = cache.get_many(keys.values())
+        snapshots = {
+            queue_id: cached[key]
+            for queue_id, key in keys.items()
+            if key in cached and not self.expired(cached[key], now)
+        }
+
+        missing = [queue for queue in queues if queue.id not in snapshots]
+        if missing:
+            built = PriorityQueueSnapshot.for_queues(missing)
+            for queue_id, snapshot in built.items():
+                cache.set(
+                    keys[queue_id], snapshot, timeout=self.get_timeout(snapshot, now)
+                )
+            snapshots.update(built)
+        return snapshots
+
+    def expired(self, snapshot, now):
+        return snapshot.expires_at is not None and snapshot.expires_at <= now
+
+    def get_timeout(self, snapshot, now):
+        if snapshot.expires_at is None:
+            return self.max_timeout
+        return min(
+            self.max_timeout,
+            max(1, math.ceil((snapshot.expires_at - now).total_seconds())),
+        )
+
+    def get(self, queue):
+        return self.get_many([queue])[queue.id]
+
+    def bump(self, queue_id):
+        """Returns the new version, None if the counter had been lost."""
+        key = self.version_key(queue_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+            return None
+
+    def invalidate(self, *queue_ids):
+        for queue_id in set(queue_ids):
+            self.bump(queue_id)
+            transaction.on_commit(lambda queue_id=queue_id: self.bump(queue_id))
+
+    def update_application(self, queue_id, application_id):
+        """
+        Moves the application to its current place in the queue's snapshot,
+        or drops it if it is no longer approved, once the transaction commits.
+
+        The snapshot under the previous version is copied and adjusted with
+        a single query instead of being rebuilt. The copy is only made when
+        the previous snapshot is still cached. Other workers keep reading the
+        previous snapshot until then, which matches the committed data.
+        """
+        transaction.on_commit(
+            lambda: self.apply_update(queue_id, application_id), robust=True
+        )
+
+    def apply_update(self, queue_id, application_id):
+        from core.models import Application
+
+        version = self.bump(queue_id)
+        if version is None:
+            return
+        now = timezone.now()
+        previous = cache.get(self.snapshot_key(queue_id, version - 1))
+        if previous is None or self.expired(previous, now):
+            return
+
+        row = (
+            Application.objects.filter(
+                pk=application_id, queue_id=queue_id, status=ApplicationStatus.APPROVED
+            )
+            .with_total_points()
+            .values_list("user_id", "total_points", "scoring__created_at")
+            .first()
+        )
+        if row is None:
+            snapshot = previous.without(application_id)
+        else:
+            user_id, points, created_at = row
+            snapshot = previous.with_application(
+                application_id,
+                user_id,
+                points,
+                anniversary_epoch(created_at, timezone.localtime(now)),
+            )
+        cache.set(
+            self.snapshot_key(queue_id, version),
+            snapshot,
+            timeout=self.get_timeout(snapshot, now),
+        )
+
+
+priority_queues = PriorityQueueSnapshotCache()
@@ -15,6 +15,7 @@ from .models import (
     Announcement,
     FaqComponent,
 )
+from .priority import priority_queues
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -179,37 +180,29 @@ class ApplicationSerializer(serializers.ModelSerializer):
             "%d %B %Y, %H:%M"
         )
 
+    def get_priority_snapshot(self, queue):
+        # Shared by every application serialized in the same response.
+        snapshots = self.context.setdefault("priority_snapshots", {})
+        if queue.id not in snapshots:
+            queues = [queue]
+            if isinstance(self.parent, serializers.ListSerializer):
+                queues += [application.queue for application in self.parent.instance]
+            snapshots.update(priority_queues.get_many(queues))
+        return snapshots[queue.id]
+
     def get_estimated_availability(self, obj):
-        if obj.queue.lodgements.count() == 0:
-            approximate_availability = None
+        snapshot = self.get_priority_snapshot(obj.queue)
+        if obj.status == ApplicationStatus.APPROVED:
+            approximate_availability = snapshot.availability_for(obj.id)
         else:
-            if obj.status == ApplicationStatus.APPROVED:
-                pq = obj.queue.get_priority_queue()
-                approximate_availability = list(
-                    filter(lambda x: x.get("application").id == obj.id, pq)
-                )[0].get("estimated_availability_date")
-            else:
-                new_application = Application(user=obj.user, queue=obj.queue, id=-1)
-                pq = obj.queue.get_priority_queue(
-                    new_application=new_application,
-                    new_application_points=obj.scoring_form.total_points,
-                )
-                approximate_availability = list(
-                    filter(lambda x: x.get("application").id == -1, pq)
-                )[0].get("estimated_availability_date")
+            approximate_availability = snapshot.hypothetical_availability(
+                obj.scoring_form.total_points
+            )
         return days_until(approximate_availability)
 
     def get_rank(self, obj):
-        applications = obj.queue.applications.filter(
-            status__in=[ApplicationStatus.APPROVED],
-        )
-        current_rank = 1
-        for application in applications:
-            if application.user == obj.user:
-                continue
-            if application.scoring_form.total_points > obj.scoring_form.total_points:
-                current_rank += 1
-        return current_rank
+        snapshot = self.get_priority_snapshot(obj.queue)
+        return snapshot.rank(obj.scoring_form.total_points, exclude_user_id=obj.user_id)
 
     def get_is_locked(self, obj):
         return obj.status in [
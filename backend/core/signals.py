@@ -0,0 +1,96 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import announcements, faq_components, scoring_form_items
+from .models import (
+    Announcement,
+    Application,
+    Assignment,
+    Document,
+    FaqComponent,
+    Form,
+    FormItem,
+    Lodgement,
+    Queue,
+    ScoringFormItem,
+)
+from .priority import priority_queues
+
+
+@receiver(post_save, sender=FormItem)
+@receiver(post_delete, sender=FormItem)
+def refresh_form_base_points(sender, instance, **kwargs):
+    Form.objects.filter(pk=instance.form_id).refresh_base_points()
+    for queue_id, application_id in Application.objects.filter(
+        forms=instance.form_id
+    ).values_list("queue_id", "id"):
+        priority_queues.update_application(queue_id, application_id)
+
+
+@receiver(post_save, sender=ScoringFormItem)
+@receiver(post_delete, sender=ScoringFormItem)
+def invalidate_scoring_form_items(sender, **kwargs):
+    scoring_form_items.invalidate()
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def invalidate_announcements(sender, **kwargs):
+    announcements.invalidate()
+
+
+@receiver(post_save, sender=FaqComponent)
+@receiver(post_delete, sender=FaqComponent)
+def invalidate_faq_components(sender, **kwargs):
+    faq_components.invalidate()
+
+
+@receiver(m2m_changed, sender=Queue.required_documents.through)
+def touch_queues(sender, instance, action, reverse, pk_set, **kwargs):
+    # Keeps Queue.updated_at, and so the queue and lodgement ETags, in step
+    # with the required documents.
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        queues = Queue.objects.filter(pk=instance.pk)
+    elif pk_set is not None:
+        queues = Queue.objects.filter(pk__in=pk_set)
+    else:
+        queues = Queue.objects.filter(pk__in=instance.queues.values("pk"))
+    queues.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Document)
+def touch_queues_of_document(sender, instance, **kwargs):
+    # The cascade removes the required_documents rows without m2m_changed.
+    Queue.objects.filter(pk__in=instance.queues.values("pk")).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Queue)
+def invalidate_queue_snapshot(sender, instance, **kwargs):
+    priority_queues.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def update_application_snapshot(sender, instance, **kwargs):
+    priority_queues.update_application(instance.queue_id, instance.pk)
+
+
+@receiver(post_save, sender=Lodgement)
+@receiver(post_delete, sender=Lodgement)
+def invalidate_queue_snapshot_of(sender, instance, **kwargs):
+    priority_queues.invalidate(instance.queue_id)
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def invalidate_assignment_snapshot(sender, instance, **kwargs):
+    priority_queues.invalidate(
+        *Lodgement.objects.filter(pk=instance.lodgement_id).values_list(
+            "queue_id", flat=True
+        )
+    )
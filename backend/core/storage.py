@@ -0,0 +1,95 @@
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.client import Config
+from django.conf import settings
+
+from .models import ApplicationDocument
+
+
+class S3ClientProvider:
+    """
+    Lazily builds one S3 client per process and hands the same client, and so
+    the same connection pool, to every request. boto3 clients are thread safe
+    but must not be shared across a fork, so a new one is built whenever the
+    pid changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def __call__(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    self._client = self.create_client()
+                    self._pid = pid
+        return self._client
+
+    def create_client(self):
+        return boto3.session.Session().client(
+            "s3",
+            region_name=settings.AWS_S3_REGION_NAME,
+            endpoint_url=getattr(settings, "AWS_S3_ENDPOINT_URL", None),
+            config=Config(
+                signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+                max_pool_connections=getattr(
+                    settings, "AWS_S3_MAX_POOL_CONNECTIONS", 10
+                ),
+            ),
+        )
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._pid = None
+
+
+s3_client = S3ClientProvider()
+
+
+def storage_key(name):
+    location = getattr(settings, "AWS_LOCATION", "")
+    return posixpath.join(location, name) if location else name
+
+
+def register_uploaded_file(s3, key, field=ApplicationDocument.file.field):
+    """
+    Returns a storage name for ``field`` that points at ``key``, an object
+    uploaded straight to the bucket through a presigned POST.
+
+    Objects already under the field's upload_to prefix are used in place,
+    anything else is copied there server side. The file never passes through
+    Django. Raises botocore's ClientError when ``key`` does not exist.
+    """
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    s3.head_object(Bucket=bucket, Key=key)
+
+    name = posixpath.join(field.upload_to, posixpath.basename(key))
+    if storage_key(name) != key:
+        s3.copy_object(
+            Bucket=bucket,
+            Key=storage_key(name),
+            CopySource={"Bucket": bucket, "Key": key},
+        )
+    return name
+
+
+def register_uploaded_files(s3, keys, field=ApplicationDocument.file.field):
+    """
+    Runs register_uploaded_file for every key on a thread pool no larger than
+    the client's connection pool and returns the names in the same order.
+    """
+    workers = min(len(keys), getattr(settings, "AWS_S3_MAX_POOL_CONNECTIONS", 10))
+    if workers <= 1:
+        return [register_uploaded_file(s3, key, field) for key in keys]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(lambda key: register_uploaded_file(s3, key, field), keys)
+        )
@@ -1,16 +1,63 @@
+import os
+import random
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+
+import numpy as np
+from botocore.exceptions import ClientError
+from django.apps import apps
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db import IntegrityError, OperationalError, connections
+from django.db.models import BooleanField, Case, OuterRef, Q, Subquery, Value, When
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate,
+)
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
-from .models import Lodgement, ScoringFormItem, Queue, Application
+from .models import (
+    Announcement,
+    Document,
+    FaqComponent,
+    Lodgement,
+    ScoringFormItem,
+    ScoringFormLog,
+    Queue,
+    Application,
+    Form,
+    FormItem,
+    Assignment,
+)
+from .cache import announcements, scoring_form_items
+from .pagination import KeysetPagination
+from .priority import PriorityQueueSnapshot, next_anniversary, priority_queues
+from .storage import S3ClientProvider
+from .views import QueueViewSet
 from .constants import (
+    SIRA_TAHSIS_4_NOLU_CETVEL_FORM,
     FormType,
     LodgementSizes,
     FormItemTypes,
     LodgementType,
     LodgementSize,
     ApplicationStatus,
+    AssignmentStatus,
+    MAX_INTEGER_ANSWER,
 )
 from constants import UserRoles, PersonalType
 
@@ -76,6 +123,151 @@ class LodgementViewSetTests(APITestCase):
         self.assertEqual(self.lodgement.name, "Updated Name")
 
 
+class ConditionalListTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.client.force_authenticate(user=self.manager)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.lodgement = Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Lodgement",
+            location="Kilyos",
+            queue=self.queue,
+        )
+        self.urls = [
+            reverse("core:lodgement-list"),
+            reverse("core:queue-list"),
+            reverse("core:queue-detail", kwargs={"pk": self.queue.id}),
+        ]
+
+    def etags(self):
+        return [self.client.get(url)["ETag"] for url in self.urls]
+
+    def test_unchanged_data_is_not_serialized_again(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(len(queries), 1)
+
+    def test_no_last_modified(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertNotIn("Last-Modified", response)
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_validators_change_with_the_data(self):
+        etags = self.etags()
+        self.lodgement.description = "Renovated"
+        self.lodgement.save()
+        self.assertNotEqual(self.etags()[0], etags[0])
+
+        etags = self.etags()
+        older = Document.objects.create(name="Kimlik")
+        newer = Document.objects.create(name="Diploma")
+        self.queue.required_documents.add(older, newer)
+        self.assertTrue(all(new != old for new, old in zip(self.etags(), etags)), etags)
+
+        # Deleting the older document leaves the latest updated_at as it was.
+        etags = self.etags()
+        older.delete()
+        self.assertTrue(all(new != old for new, old in zip(self.etags(), etags)), etags)
+
+        etags = self.etags()
+        Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Another lodgement",
+            location="Kilyos",
+            queue=self.queue,
+        )
+        self.assertNotEqual(self.etags()[0], etags[0])
+
+        etags = self.etags()
+        self.lodgement.delete()
+        self.assertNotEqual(self.etags()[0], etags[0])
+
+    def test_missing_queue(self):
+        response = self.client.get(reverse("core:queue-detail", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.client.force_authenticate(user=self.manager)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        Lodgement.objects.bulk_create(
+            Lodgement(
+                size=LodgementSizes.ONE_PLUS_ONE,
+                description=f"Lodgement {i}",
+                location="Kilyos",
+                queue=self.queue,
+            )
+            for i in range(7)
+        )
+        # Ties on created_at must be broken by id.
+        Lodgement.objects.update(created_at=timezone.now())
+        self.url = reverse("core:lodgement-list")
+
+    def test_plain_list_is_not_paginated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 7)
+
+    def test_cursor_walks_every_row_once(self):
+        ids = []
+        url = f"{self.url}?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            ids += [item["id"] for item in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(
+            ids, list(Lodgement.objects.order_by("id").values_list("id", flat=True))
+        )
+
+    def test_count(self):
+        response = self.client.get(self.url, {"page_size": 5, "count": 1})
+        self.assertEqual(response.data["count"], 7)
+        self.assertNotIn("count", self.client.get(self.url, {"page_size": 5}).data)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        now = timezone.now().isoformat()
+        for values in [
+            ["garbage", 1],
+            [{"a": 1}, 1],
+            [now, "one"],
+            [now, [1]],
+            [None, 1],
+            [now, None],
+        ]:
+            cursor = KeysetPagination().encode_cursor(values)
+            response = self.client.get(self.url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+
 class ScoringFormViewSetTests(APITestCase):
     def setUp(self):
         self.client = APIClient()
@@ -138,3 +330,1513 @@ class QueueViewSetTests(APITestCase):
         self.assertEqual(
             response.data["error"], "Invalid data format, expected a list of items"
         )
+
+
+def create_scored_application(user, queue, points, status=ApplicationStatus.APPROVED):
+    application = Application.objects.create(user=user, queue=queue, status=status)
+    form = Form.objects.create(type=FormType.SCORING, application=application)
+    form.items.create(
+        label="Puan",
+        caption="Puan",
+        field_type=FormItemTypes.INTEGER,
+        point=1,
+        answer={"value": points},
+    )
+    return application
+
+
+class FormPointsTests(APITestCase):
+    def setUp(self):
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.users = [
+            User.objects.create_user(username=f"user{i}", password="testpassword")
+            for i in range(3)
+        ]
+
+    def test_base_points_follow_item_answers(self):
+        application = create_scored_application(self.users[0], self.queue, 5)
+        form = application.scoring_form
+        self.assertEqual(form.base_points, 5)
+
+        married = form.items.create(
+            label="Eşiniz var mı?",
+            caption="Eş",
+            field_type=FormItemTypes.BOOLEAN,
+            point=6,
+            answer={"value": 1},
+        )
+        form.refresh_from_db()
+        self.assertEqual(form.base_points, 11)
+
+        married.answer = {"value": 0}
+        married.save()
+        form.refresh_from_db()
+        self.assertEqual(form.base_points, 5)
+
+        married.delete()
+        form.items.update(answer={"value": 2})
+        form.refresh_base_points()
+        self.assertEqual(form.base_points, 2)
+
+    def test_total_points_annotation_matches_property(self):
+        application = create_scored_application(self.users[0], self.queue, 5)
+        Form.objects.filter(application=application).update(
+            created_at=timezone.now() - relativedelta(years=2, days=1)
+        )
+        annotated = Application.objects.with_total_points().get(pk=application.pk)
+        self.assertEqual(annotated.total_points, 7)
+        self.assertEqual(application.scoring_form.total_points, 7)
+
+    def test_priority_queue_is_ordered_by_points(self):
+        low = create_scored_application(self.users[0], self.queue, 1)
+        high = create_scored_application(self.users[1], self.queue, 9)
+        create_scored_application(
+            self.users[2], self.queue, 20, status=ApplicationStatus.PENDING
+        )
+
+        pq = self.queue.get_priority_queue()
+        self.assertEqual([entry["application"] for entry in pq], [high, low])
+        self.assertEqual([entry["total_points"] for entry in pq], [9, 1])
+
+    def test_live_points_match_python_computation(self):
+        application = create_scored_application(self.users[0], self.queue, 0)
+        form = application.scoring_form
+        answers = [
+            (FormItemTypes.INTEGER, 3, {"value": 2}),
+            (FormItemTypes.INTEGER, -10, {"value": "4"}),
+            (FormItemTypes.INTEGER, 5, {"value": "abc"}),
+            (FormItemTypes.INTEGER, 5, {"value": None}),
+            (FormItemTypes.INTEGER, None, {"value": 7}),
+            (FormItemTypes.INTEGER, 5, {"value": "9" * 30}),
+            (FormItemTypes.INTEGER, 5, {"value": 2**40}),
+            (FormItemTypes.INTEGER, 40, {"value": MAX_INTEGER_ANSWER + 1}),
+            (FormItemTypes.INTEGER, 1, {"value": -MAX_INTEGER_ANSWER}),
+            (FormItemTypes.BOOLEAN, 6, {"value": True}),
+            (FormItemTypes.BOOLEAN, 6, {"value": 1}),
+            (FormItemTypes.BOOLEAN, -1, {"value": 0}),
+            (FormItemTypes.BOOLEAN, -1, {"value": False}),
+            (FormItemTypes.BOOLEAN, -1, {}),
+            (FormItemTypes.TEXT, 4, {"value": "text"}),
+        ]
+        for field_type, point, answer in answers:
+            form.items.create(
+                label="Soru",
+                caption="Soru",
+                field_type=field_type,
+                point=point,
+                answer=answer,
+            )
+
+        expected = sum(item.earned_points for item in form.items.all())
+        self.assertEqual(expected, 6 - 40 + 6 + 6 - MAX_INTEGER_ANSWER)
+        self.assertEqual(
+            Form.objects.with_live_base_points().get(pk=form.pk).live_base_points,
+            expected,
+        )
+        live = Application.objects.with_total_points(live=True).get(pk=application.pk)
+        self.assertEqual(live.total_points, expected)
+
+    def test_check_and_backfill_commands(self):
+        cache.clear()
+        application = create_scored_application(self.users[0], self.queue, 5)
+        Form.objects.filter(application=application).update(base_points=0)
+        self.assertEqual(list(priority_queues.get(self.queue).points), [0])
+
+        with self.assertRaises(CommandError):
+            call_command("check_form_points", stdout=StringIO())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("backfill_form_points", stdout=StringIO())
+        call_command("check_form_points", stdout=StringIO())
+        self.assertEqual(application.scoring_form.base_points, 5)
+        self.assertEqual(list(priority_queues.get(self.queue).points), [5])
+
+
+class PriorityQueueTests(APITestCase):
+    def setUp(self):
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.now = timezone.now()
+        self.busy_until = self.now + relativedelta(months=6)
+        self.available = self.create_lodgement(None)
+        self.busy = self.create_lodgement(self.busy_until)
+        self.applications = [
+            create_scored_application(
+                User.objects.create_user(username=f"user{i}", password="pw"),
+                self.queue,
+                points,
+            )
+            for i, points in enumerate([10, 30, 20])
+        ]
+
+    def create_lodgement(self, busy_until):
+        return Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Lodgement",
+            location="Kilyos",
+            busy_until=busy_until,
+            queue=self.queue,
+        )
+
+    def test_priority_queue_assigns_lodgements_in_order(self):
+        pq = self.queue.get_priority_queue(
+            new_application=Application(queue=self.queue, id=-1),
+            new_application_points=25,
+        )
+        self.assertEqual(
+            [entry["application"].id for entry in pq],
+            [
+                self.applications[1].id,
+                -1,
+                self.applications[2].id,
+                self.applications[0].id,
+            ],
+        )
+        self.assertEqual(
+            [entry["lodgement"] for entry in pq],
+            [self.available, self.busy, None, None],
+        )
+        self.assertEqual(pq[1]["estimated_availability_date"], self.busy_until)
+        self.assertIsNone(pq[2]["estimated_availability_date"])
+
+    def test_snapshot_lookups(self):
+        snapshot = PriorityQueueSnapshot.for_queue(self.queue)
+        self.assertEqual(snapshot.insert_position(20), 2)
+        self.assertEqual(snapshot.insert_position(40), 0)
+        self.assertEqual(
+            snapshot.availability_for(self.applications[1].id, self.now), self.now
+        )
+        self.assertEqual(
+            snapshot.availability_for(self.applications[2].id), self.busy_until
+        )
+        self.assertIsNone(snapshot.availability_for(self.applications[0].id))
+        self.assertEqual(snapshot.hypothetical_availability(25), self.busy_until)
+
+
+class NextAnniversaryTests(SimpleTestCase):
+    def test_next_anniversary(self):
+        created_at = timezone.make_aware(datetime(2020, 6, 15, 12))
+        for now, expected in [
+            (datetime(2024, 6, 15, 11), datetime(2024, 6, 15, 12)),
+            (datetime(2024, 6, 15, 12), datetime(2025, 6, 15, 12)),
+            (datetime(2024, 12, 1), datetime(2025, 6, 15, 12)),
+        ]:
+            self.assertEqual(
+                next_anniversary(created_at, timezone.make_aware(now)),
+                timezone.make_aware(expected),
+            )
+
+    def test_leap_day(self):
+        created_at = timezone.make_aware(datetime(2024, 2, 29, 12))
+        self.assertEqual(
+            next_anniversary(created_at, timezone.make_aware(datetime(2025, 1, 1))),
+            timezone.make_aware(datetime(2025, 3, 1)),
+        )
+
+
+class QueuePositionTests(APITestCase):
+    def setUp(self):
+        self.queues = [
+            Queue.objects.create(
+                lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+                personel_type=PersonalType.ADMINISTRATIVE,
+                lodgement_size=size,
+            )
+            for size in (LodgementSize.ONE_PLUS_ONE, LodgementSize.TWO_PLUS_ONE)
+        ]
+        self.queue = self.queues[0]
+        now = timezone.now()
+        for busy_until in [now + relativedelta(months=2), None, now]:
+            Lodgement.objects.create(
+                size=LodgementSizes.ONE_PLUS_ONE,
+                description="Lodgement",
+                location="Kilyos",
+                busy_until=busy_until,
+                queue=self.queue,
+            )
+        users = iter(
+            User.objects.create_user(username=f"user{i}", password="pw")
+            for i in range(10)
+        )
+        for points in [20, 35, 20, 5]:
+            create_scored_application(next(users), self.queue, points)
+        create_scored_application(
+            next(users), self.queue, 50, status=ApplicationStatus.PENDING
+        )
+        for points in [7, 9]:
+            create_scored_application(next(users), self.queues[1], points)
+
+    def test_positions_match_the_snapshot_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            applications = Application.objects.with_queue_positions()
+        self.assertEqual(len(queries), 1)
+
+        for queue in self.queues:
+            snapshot = PriorityQueueSnapshot.for_queue(queue)
+            rows = [a for a in applications if a.queue_id == queue.id]
+            self.assertEqual([a.id for a in rows], snapshot.application_ids.tolist())
+            self.assertEqual(
+                [a.queue_position for a in rows], list(range(1, len(rows) + 1))
+            )
+            self.assertEqual(
+                [a.queue_rank for a in rows],
+                [snapshot.rank(points) for points in snapshot.points.tolist()],
+            )
+            for position, application in enumerate(rows):
+                self.assertEqual(
+                    application.slot_lodgement_id, snapshot.lodgement_at(position)
+                )
+                expected = snapshot.availability_at(position)
+                if expected is None:
+                    self.assertIsNone(application.estimated_availability)
+                else:
+                    self.assertAlmostEqual(
+                        application.estimated_availability,
+                        expected,
+                        delta=timedelta(seconds=5),
+                    )
+
+        self.assertEqual(
+            [a.queue_rank for a in applications if a.queue_id == self.queue.id],
+            [1, 2, 2, 4],
+        )
+
+    def test_positions_endpoint(self):
+        manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.client.force_authenticate(user=manager)
+        response = self.client.get(
+            reverse("core:queue-positions", kwargs={"pk": self.queues[1].id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["total_points"] for row in response.data], [9, 7])
+        self.assertEqual([row["lodgement_id"] for row in response.data], [None, None])
+
+
+class PriorityQueueSnapshotCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.lodgement = Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Lodgement",
+            location="Kilyos",
+            queue=self.queue,
+        )
+        self.users = [
+            User.objects.create_user(username=f"user{i}", password="pw")
+            for i in range(2)
+        ]
+        self.application = create_scored_application(self.users[0], self.queue, 10)
+
+    def snapshot(self):
+        return priority_queues.get(self.queue)
+
+    def test_snapshot_is_served_from_the_cache(self):
+        self.assertEqual(self.snapshot().points.tolist(), [10])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.snapshot().points.tolist(), [10])
+        self.assertEqual(len(queries), 0)
+
+    def test_status_changes_update_the_snapshot_in_place(self):
+        self.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            pending = create_scored_application(
+                self.users[1], self.queue, 20, status=ApplicationStatus.PENDING
+            )
+        self.assertEqual(len(self.snapshot()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.status = ApplicationStatus.APPROVED
+            pending.save()
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = self.snapshot()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            snapshot.application_ids.tolist(), [pending.id, self.application.id]
+        )
+        self.assertEqual(snapshot.rank(15), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.application.status = ApplicationStatus.CANCELLED
+            self.application.save()
+        self.assertEqual(self.snapshot().application_ids.tolist(), [pending.id])
+
+    def test_rescoring_updates_the_snapshot_in_place(self):
+        self.snapshot()
+        item = self.application.scoring_form.items.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            item.answer = {"value": 15}
+            item.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.snapshot().points.tolist(), [15])
+        self.assertEqual(len(queries), 0)
+
+    def test_in_place_updates_match_a_rebuild(self):
+        self.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, points in enumerate([10, 30, 10, 5]):
+                user = User.objects.create_user(username=f"other{i}", password="pw")
+                create_scored_application(user, self.queue, points)
+            self.application.status = ApplicationStatus.REJECTED
+            self.application.save()
+        cached = self.snapshot()
+        rebuilt = PriorityQueueSnapshot.for_queue(self.queue)
+        self.assertEqual(
+            cached.application_ids.tolist(), rebuilt.application_ids.tolist()
+        )
+        self.assertEqual(cached.points.tolist(), rebuilt.points.tolist())
+        self.assertEqual(cached.user_ids.tolist(), rebuilt.user_ids.tolist())
+        self.assertEqual(cached.expires_at, rebuilt.expires_at)
+
+    def test_lodgement_changes_invalidate_the_snapshot(self):
+        self.snapshot()
+        busy_until = timezone.now() + relativedelta(months=3)
+        self.lodgement.busy_until = busy_until
+        self.lodgement.save()
+        self.assertEqual(self.snapshot().availability_at(0), busy_until)
+
+    def test_assignments_invalidate_the_snapshot(self):
+        self.snapshot()
+        self.queue.assign(self.application, self.lodgement)
+        self.assertEqual(len(self.snapshot()), 0)
+
+    def test_snapshot_expires_on_the_next_anniversary(self):
+        now = timezone.now()
+        Form.objects.filter(application=self.application).update(
+            created_at=now - relativedelta(years=1, seconds=-30)
+        )
+        snapshot = self.snapshot()
+        self.assertEqual(snapshot.points.tolist(), [10])
+        self.assertEqual(
+            snapshot.expires_at,
+            self.application.scoring_form.created_at + relativedelta(years=1),
+        )
+        self.assertAlmostEqual(priority_queues.get_timeout(snapshot, now), 30, delta=2)
+
+        later = now + relativedelta(minutes=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(self.snapshot().points.tolist(), [11])
+
+    @override_settings(PRIORITY_QUEUE_CACHE_TIMEOUT=600)
+    def test_snapshot_timeout_is_bounded(self):
+        now = timezone.now()
+        snapshot = self.snapshot()
+        self.assertGreater(snapshot.expires_at, now + relativedelta(hours=1))
+        self.assertEqual(priority_queues.get_timeout(snapshot, now), 600)
+
+        empty = PriorityQueueSnapshot(self.queue.id, [], [], [], [], [])
+        self.assertIsNone(empty.expires_at)
+        self.assertEqual(priority_queues.get_timeout(empty, now), 600)
+
+    def test_version_is_bumped_again_on_commit(self):
+        version = priority_queues.get_versions([self.queue.id])[self.queue.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            priority_queues.invalidate(self.queue.id)
+            self.assertEqual(
+                priority_queues.get_versions([self.queue.id])[self.queue.id],
+                version + 1,
+            )
+        self.assertEqual(
+            priority_queues.get_versions([self.queue.id])[self.queue.id], version + 2
+        )
+
+
+class ApplicationReviewQueryTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.client.force_authenticate(user=self.manager)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Lodgement",
+            location="Kilyos",
+            queue=self.queue,
+        )
+        self.url = reverse("core:application-applications-waiting-for-review")
+        self.users = 0
+
+    def add_applications(self, count, status=ApplicationStatus.PENDING):
+        for _ in range(count):
+            self.users += 1
+            user = User.objects.create_user(username=f"user{self.users}", password="pw")
+            create_scored_application(user, self.queue, self.users, status=status)
+
+    def count_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response.data
+
+    def test_query_count_does_not_grow_with_pending_applications(self):
+        self.add_applications(2)
+        self.add_applications(2, status=ApplicationStatus.APPROVED)
+        queries, data = self.count_queries()
+        self.assertEqual(len(data), 2)
+
+        self.add_applications(5)
+        self.add_applications(5, status=ApplicationStatus.APPROVED)
+        self.assertEqual(self.count_queries()[0], queries)
+
+    def test_paginated_review_queue(self):
+        self.add_applications(3)
+        response = self.client.get(self.url, {"page_size": 2})
+        first = [item["id"] for item in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        second = [item["id"] for item in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(
+            first + second,
+            list(
+                Application.objects.order_by("created_at", "id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+    def test_rank_and_availability_come_from_the_snapshot(self):
+        self.add_applications(2)
+        self.add_applications(1, status=ApplicationStatus.APPROVED)
+        _, data = self.count_queries()
+        self.assertEqual([item["rank"] for item in data], [2, 2])
+        self.assertEqual(
+            [item["estimated_availability"] for item in data],
+            ["No available lodgements.", "No available lodgements."],
+        )
+
+
+class EndpointQueryCountTests(APITestCase):
+    # Upper bounds per endpoint, whatever the number of rows involved.
+    MAX_QUERIES = {
+        "application-list": 2,
+        "application-detail": 8,
+        "application-applications-waiting-for-review": 8,
+        "application-get-application-manager": 8,
+        "application-review": 9,
+        "queue-list": 3,
+        "queue-detail": 3,
+    }
+
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.applicant = User.objects.create_user(username="applicant", password="pw")
+        self.documents = [
+            Document.objects.create(name=f"Document {i}") for i in range(3)
+        ]
+        self.queues = []
+        self.rows = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.rows += 1
+            queue = Queue.objects.create(
+                lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+                personel_type=PersonalType.ADMINISTRATIVE,
+                lodgement_size=LodgementSize.ONE_PLUS_ONE,
+            )
+            queue.required_documents.set(self.documents)
+            self.queues.append(queue)
+            application = create_scored_application(
+                self.applicant, queue, self.rows, status=ApplicationStatus.PENDING
+            )
+            for document in self.documents:
+                application.documents.create(
+                    document=document, file=f"application_documents/{document.id}"
+                )
+        self.application = application
+        self.queue = queue
+
+    def count_queries(self, name, user, method="get", kwargs=None, data=None):
+        self.client.force_authenticate(user=user)
+        url = reverse(f"core:{name}", kwargs=kwargs)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return len(context.captured_queries)
+
+    def requests(self):
+        pk = {"pk": self.application.id}
+        return [
+            ("application-list", self.applicant, "get", None, None),
+            ("application-detail", self.applicant, "get", pk, None),
+            (
+                "application-applications-waiting-for-review",
+                self.manager,
+                "get",
+                None,
+                None,
+            ),
+            (
+                "application-get-application-manager",
+                self.manager,
+                "post",
+                None,
+                {"application_id": self.application.id},
+            ),
+            (
+                "application-review",
+                self.manager,
+                "post",
+                None,
+                {
+                    "application_id": self.application.id,
+                    "status": ApplicationStatus.RE_UPLOAD,
+                },
+            ),
+            ("queue-list", self.manager, "get", None, None),
+            ("queue-detail", self.manager, "get", {"pk": self.queue.id}, None),
+        ]
+
+    def test_query_counts_are_bounded(self):
+        for rows in (1, 4):
+            self.add_rows(rows)
+            for name, user, method, kwargs, data in self.requests():
+                with self.subTest(endpoint=name, rows=self.rows):
+                    queries = self.count_queries(name, user, method, kwargs, data)
+                    self.assertLessEqual(queries, self.MAX_QUERIES[name])
+                Application.objects.update(status=ApplicationStatus.PENDING)
+
+
+class AcademicAssignmentTests(APITestCase):
+    def setUp(self):
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ACADEMIC,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.now = timezone.now()
+        self.users = 0
+        for is_new in [True, True, True, False]:
+            lodgement = self.create_lodgement(self.now + relativedelta(years=2))
+            application = self.create_application(
+                is_new, 0, status=ApplicationStatus.ASSIGNED
+            )
+            Assignment.objects.create(
+                application=application,
+                lodgement=lodgement,
+                start_date=self.now - relativedelta(years=1),
+                end_date=lodgement.busy_until,
+                status=AssignmentStatus.ACTIVE,
+            )
+        self.assignable = [
+            self.create_lodgement(None),
+            self.create_lodgement(self.now + relativedelta(days=5)),
+            self.create_lodgement(self.now + relativedelta(days=10)),
+            self.create_lodgement(self.now + relativedelta(days=20)),
+        ]
+        self.new = [self.create_application(True, points) for points in [5, 8, 1, 3]]
+        self.old = [self.create_application(False, points) for points in [2, 7]]
+        self.create_application(None, 100)
+
+    def create_lodgement(self, busy_until):
+        return Lodgement.objects.create(
+            size=LodgementSizes.ONE_PLUS_ONE,
+            description="Lodgement",
+            location="Kilyos",
+            busy_until=busy_until,
+            queue=self.queue,
+        )
+
+    def create_application(self, is_new, points, status=ApplicationStatus.APPROVED):
+        self.users += 1
+        if is_new is None:
+            start_of_employment = None
+        elif is_new:
+            start_of_employment = self.now.date() - relativedelta(years=1)
+        else:
+            start_of_employment = self.now.date() - relativedelta(years=10)
+        user = User.objects.create_user(
+            username=f"academic{self.users}",
+            password="pw",
+            start_of_employment=start_of_employment,
+        )
+        return create_scored_application(user, self.queue, points, status=status)
+
+    def assigned_lodgements(self):
+        return {
+            assignment.application_id: assignment.lodgement_id
+            for assignment in Assignment.objects.filter(status=AssignmentStatus.LOCKED)
+        }
+
+    def test_assignments_follow_the_new_to_old_ratio(self):
+        self.queue.make_assignments_academic()
+
+        self.assertEqual(
+            self.assigned_lodgements(),
+            {
+                self.new[1].id: self.assignable[0].id,
+                self.new[0].id: self.assignable[1].id,
+                self.new[3].id: self.assignable[2].id,
+                self.old[1].id: self.assignable[3].id,
+            },
+        )
+        self.assertEqual(
+            Application.objects.filter(
+                queue=self.queue, status=ApplicationStatus.APPROVED
+            ).count(),
+            3,
+        )
+        for lodgement in self.assignable:
+            lodgement.refresh_from_db()
+            self.assertGreater(lodgement.busy_until, self.now + relativedelta(years=5))
+
+    def reference_assignments(self):
+        """
+        The assignment loop ``plan_assignments_academic`` replaced, which
+        assigns one lodgement at a time and reloads everything after each.
+        """
+        queue = self.queue
+        thirty_days_later = timezone.now().date() + timezone.timedelta(days=30)
+        threshold_date = datetime.now() - relativedelta(years=3)
+        lodgement_count = queue.lodgements.count()
+
+        def load():
+            active_assignment_subquery = Assignment.objects.filter(
+                lodgement=OuterRef("pk"),
+                status__in=[AssignmentStatus.ACTIVE, AssignmentStatus.LOCKED],
+            ).values("application__user__start_of_employment")[:1]
+            assigned_lodgements = queue.lodgements.annotate(
+                start_of_employment=Subquery(active_assignment_subquery),
+                is_new=Case(
+                    When(start_of_employment__gte=threshold_date, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                ),
+            ).filter(busy_until__gte=thirty_days_later)
+            approved = queue.applications.filter(status=ApplicationStatus.APPROVED)
+            return (
+                len(
+                    [lodgement for lodgement in assigned_lodgements if lodgement.is_new]
+                ),
+                len(
+                    [
+                        lodgement
+                        for lodgement in assigned_lodgements
+                        if not lodgement.is_new
+                    ]
+                ),
+                list(
+                    queue.lodgements.filter(
+                        Q(busy_until__isnull=True)
+                        | Q(busy_until__lte=thirty_days_later)
+                    ).order_by("busy_until")
+                ),
+                list(
+                    approved.filter(
+                        user__start_of_employment__gte=threshold_date
+                    ).by_priority()
+                ),
+                list(
+                    approved.filter(
+                        user__start_of_employment__lt=threshold_date
+                    ).by_priority()
+                ),
+            )
+
+        desired_vector = np.array([0.8 * lodgement_count, 0.2 * lodgement_count])
+        new_count, old_count, lodgements, new, old = load()
+        assignments = []
+        while lodgements and (new or old):
+            lodgement = lodgements.pop(0)
+            if np.linalg.norm(
+                np.array([new_count + 1, old_count]) - desired_vector
+            ) < np.linalg.norm(np.array([new_count, old_count + 1]) - desired_vector):
+                application = new.pop(0) if new else old.pop(0)
+            else:
+                application = old.pop(0) if old else new.pop(0)
+            queue.assign(application, lodgement)
+            assignments.append((application.id, lodgement.id))
+            new_count, old_count, lodgements, new, old = load()
+        return assignments
+
+    @override_settings(
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+    )
+    def test_plan_matches_the_reference_on_random_queues(self):
+        for seed in range(40):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                self.queue = Queue.objects.create(
+                    lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+                    personel_type=PersonalType.ACADEMIC,
+                    lodgement_size=LodgementSize.ONE_PLUS_ONE,
+                )
+                for _ in range(rng.randint(0, 20)):
+                    # Occupied for years, free or freed within thirty days.
+                    lodgement = self.create_lodgement(
+                        rng.choice(
+                            [
+                                self.now + relativedelta(years=rng.randint(1, 4)),
+                                self.now + relativedelta(days=rng.randint(-90, 29)),
+                                None,
+                            ]
+                        )
+                    )
+                    if lodgement.busy_until and rng.random() < 0.8:
+                        Assignment.objects.create(
+                            application=self.create_application(
+                                rng.choice([True, False, None]),
+                                0,
+                                status=ApplicationStatus.ASSIGNED,
+                            ),
+                            lodgement=lodgement,
+                            start_date=self.now - relativedelta(years=1),
+                            end_date=lodgement.busy_until,
+                            status=rng.choice(AssignmentStatus.values),
+                        )
+                for _ in range(rng.randint(0, 20)):
+                    self.create_application(
+                        rng.choice([True, True, False, None]),
+                        rng.randint(0, 10),
+                        status=rng.choice(
+                            [ApplicationStatus.APPROVED] * 3
+                            + [ApplicationStatus.PENDING]
+                        ),
+                    )
+
+                plan = [
+                    (application.id, lodgement.id)
+                    for application, lodgement in self.queue.plan_assignments_academic()
+                ]
+                self.assertEqual(plan, self.reference_assignments())
+
+
+class DefaultAssignmentTests(APITestCase):
+    def setUp(self):
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.DUTY_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        now = timezone.now()
+        self.lodgements = [
+            Lodgement.objects.create(
+                size=LodgementSizes.ONE_PLUS_ONE,
+                description="Lodgement",
+                location="Kilyos",
+                busy_until=busy_until,
+                queue=self.queue,
+            )
+            for busy_until in [now + relativedelta(days=10), None, None]
+        ]
+        self.applications = [
+            create_scored_application(
+                User.objects.create_user(username=f"user{i}", password="pw"),
+                self.queue,
+                points,
+            )
+            for i, points in enumerate([4, 9])
+        ]
+
+    def test_assignments_are_written_in_bulk(self):
+        with CaptureQueriesContext(connection) as context:
+            assignments = self.queue.make_assignments_default()
+
+        self.assertEqual(len(assignments), 2)
+        self.assertLessEqual(len(context.captured_queries), 8)
+        self.assertEqual(
+            Application.objects.filter(status=ApplicationStatus.ASSIGNED).count(), 2
+        )
+        self.assertEqual(Assignment.objects.count(), 2)
+
+    def test_pipeline_command_reports_each_queue(self):
+        Queue.objects.create(
+            lodgement_type=LodgementType.SERVICE_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        out = StringIO()
+        call_command("run_assignment_pipeline", stdout=out)
+
+        self.assertIn(
+            f"Queue {self.queue.id} ({self.queue}): 2 assignments", out.getvalue()
+        )
+        self.assertIn("2 assignments across 2 queues", out.getvalue())
+        self.assertEqual(self.queue.assignment_pipeline(), [])
+
+    def test_failed_queue_fails_the_command(self):
+        err = StringIO()
+        with mock.patch.object(
+            Queue, "assignment_pipeline", side_effect=RuntimeError("boom")
+        ):
+            with self.assertRaisesMessage(CommandError, "1 queues failed"):
+                call_command("run_assignment_pipeline", stdout=StringIO(), stderr=err)
+        self.assertIn(f"Queue {self.queue.id} ({self.queue}) failed", err.getvalue())
+        self.assertIn("boom", err.getvalue())
+
+    def test_simulation_does_not_write(self):
+        manager = User.objects.create_user(
+            username="manager", password="pw", role=UserRoles.MANAGER
+        )
+        self.client.force_authenticate(user=manager)
+        response = self.client.get(
+            reverse("core:queue-simulate", kwargs={"pk": self.queue.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["application_id"] for item in response.data["assignments"]],
+            [self.applications[1].id, self.applications[0].id],
+        )
+
+        out = StringIO()
+        call_command("run_assignment_pipeline", "--dry-run", stdout=out)
+        self.assertIn("2 planned across 1 queues", out.getvalue())
+        self.assertFalse(Assignment.objects.exists())
+
+        self.client.force_authenticate(user=self.applications[0].user)
+        response = self.client.get(
+            reverse("core:queue-simulate", kwargs={"pk": self.queue.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_assign_many_is_all_or_nothing(self):
+        pairs = [
+            (self.applications[0], self.lodgements[0]),
+            (self.applications[1], Lodgement(queue=self.queue)),
+        ]
+        with self.assertRaises(ValueError):
+            self.queue.assign_many(pairs)
+
+        self.assertFalse(Assignment.objects.exists())
+        self.lodgements[0].refresh_from_db()
+        self.assertLess(
+            self.lodgements[0].busy_until, timezone.now() + relativedelta(days=30)
+        )
+
+
+class ScoringFormItemRegistryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.items = [
+            ScoringFormItem.objects.create(
+                type=FormType.SCORING,
+                label=f"Soru {point}",
+                caption="Soru",
+                field_type=FormItemTypes.INTEGER,
+                point=point,
+            )
+            for point in [1, 2, 3]
+        ]
+        self.url = reverse("core:queue-evaluate", kwargs={"pk": self.queue.id})
+        self.data = [
+            {"scoring_form_item_id": item.id, "answer": 2} for item in self.items
+        ]
+
+    def evaluate(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item_queries = [
+            query
+            for query in context.captured_queries
+            if "core_scoringformitem" in query["sql"]
+        ]
+        return response.data["total_points"], len(item_queries)
+
+    def test_evaluate_reads_items_from_the_registry(self):
+        self.assertEqual(self.evaluate(), (12, 1))
+        self.assertEqual(self.evaluate(), (12, 0))
+
+        self.items[2].point = 10
+        self.items[2].save()
+        self.assertEqual(self.evaluate(), (26, 1))
+
+        self.items[0].delete()
+        self.assertEqual(self.evaluate(), (24, 1))
+
+    def test_oversized_answer_is_rejected(self):
+        data = [{"scoring_form_item_id": self.items[0].id, "answer": 10**9}]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ScoringFormLog.objects.exists())
+
+    def test_version_is_read_once_per_request(self):
+        self.evaluate()
+        with mock.patch("core.cache.cache.get", wraps=cache.get) as cache_get:
+            self.evaluate()
+        version_reads = [
+            call
+            for call in cache_get.call_args_list
+            if call.args == (scoring_form_items.version_key,)
+        ]
+        self.assertEqual(len(version_reads), 1)
+
+    def test_version_is_replaced_again_on_commit(self):
+        scoring_form_items.get(self.items[0].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[0].save()
+            version = scoring_form_items.current_version()
+        self.assertNotEqual(scoring_form_items.current_version(), version)
+
+
+class ApplyTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.url = reverse("core:queue-apply", kwargs={"pk": self.queue.id})
+
+    def test_apply_prefills_answers_from_the_latest_log(self):
+        template = SIRA_TAHSIS_4_NOLU_CETVEL_FORM[-1]
+        scoring_form_item = ScoringFormItem.objects.create(
+            type=FormType.SCORING,
+            label=template["label"],
+            caption=template["caption"],
+            field_type=template["field_type"],
+            point=template["point"],
+        )
+        ScoringFormLog.objects.create(
+            user=self.user,
+            data=[{"scoring_form_item_id": scoring_form_item.id, "answer": 3}],
+        )
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        form = Application.objects.get(user=self.user).scoring_form
+        self.assertEqual(form.items.count(), len(SIRA_TAHSIS_4_NOLU_CETVEL_FORM))
+        self.assertEqual(form.items.get(label=template["label"]).answer, {"value": 3})
+        self.assertEqual(form.base_points, 3 * template["point"])
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def create_duplicates(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "unique_active_application"')
+        other = User.objects.create_user(username="other", password="pw")
+        approved = Application.objects.create(
+            user=self.user, queue=self.queue, status=ApplicationStatus.APPROVED
+        )
+        pending = Application.objects.create(
+            user=self.user, queue=self.queue, status=ApplicationStatus.PENDING
+        )
+        older, newer = [
+            Application.objects.create(
+                user=other, queue=self.queue, status=ApplicationStatus.IN_PROGRESS
+            )
+            for _ in range(2)
+        ]
+        return approved, pending, older, newer
+
+    def test_migration_refuses_duplicates(self):
+        migration = import_module("core.migrations.0008_unique_active_application")
+        approved, pending, older, newer = self.create_duplicates()
+
+        with self.assertRaises(RuntimeError) as context:
+            migration.check_duplicate_applications(apps, None)
+        message = str(context.exception)
+        self.assertIn(f"applications {approved.pk}, {pending.pk}", message)
+        self.assertIn(f"applications {older.pk}, {newer.pk}", message)
+        self.assertEqual(
+            Application.objects.filter(status=ApplicationStatus.CANCELLED).count(), 0
+        )
+
+    def test_duplicates_are_only_cancelled_when_applied(self):
+        approved, pending, older, newer = self.create_duplicates()
+
+        output = StringIO()
+        call_command("cancel_duplicate_applications", stdout=output)
+        self.assertIn(f"Would cancel application {pending.pk} ", output.getvalue())
+        self.assertFalse(
+            Application.objects.filter(status=ApplicationStatus.CANCELLED).exists()
+        )
+
+        output = StringIO()
+        call_command("cancel_duplicate_applications", "--apply", stdout=output)
+        statuses = dict(Application.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[approved.pk], ApplicationStatus.APPROVED)
+        self.assertEqual(statuses[pending.pk], ApplicationStatus.CANCELLED)
+        self.assertEqual(statuses[newer.pk], ApplicationStatus.IN_PROGRESS)
+        self.assertEqual(statuses[older.pk], ApplicationStatus.CANCELLED)
+        self.assertIn(f"Cancelling application {older.pk} ", output.getvalue())
+
+
+class ConcurrentApplyTests(TransactionTestCase):
+    workers = 6
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="pw")
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.url = reverse("core:queue-apply", kwargs={"pk": self.queue.id})
+
+    def apply(self, barrier, responses):
+        # The test client re-raises exceptions through a global signal, so
+        # under threads it can raise another request's error. Call the view
+        # directly instead.
+        view = QueueViewSet.as_view({"post": "apply"})
+        try:
+            barrier.wait()
+            while True:
+                request = APIRequestFactory().post(self.url)
+                force_authenticate(request, user=self.user)
+                try:
+                    responses.append(view(request, pk=self.queue.id).status_code)
+                    return
+                except OperationalError as e:
+                    # SQLite's shared-cache test database locks whole tables
+                    # instead of waiting, retry like a client would. apply
+                    # commits last, so a request that raised has rolled back.
+                    if "locked" not in str(e):
+                        raise
+                    time.sleep(0.01)
+        finally:
+            connections.close_all()
+
+    def test_only_one_concurrent_application_is_created(self):
+        barrier = threading.Barrier(self.workers)
+        responses = []
+        threads = [
+            threading.Thread(target=self.apply, args=(barrier, responses))
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses), self.workers)
+        self.assertEqual(responses.count(status.HTTP_201_CREATED), 1, responses)
+        self.assertEqual(
+            set(responses) - {status.HTTP_201_CREATED}, {status.HTTP_400_BAD_REQUEST}
+        )
+        self.assertEqual(Application.objects.filter(user=self.user).count(), 1)
+
+    def test_cancelled_applications_do_not_count(self):
+        create_scored_application(
+            self.user, self.queue, 0, status=ApplicationStatus.CANCELLED
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.post(self.url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(client.post(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with mock.patch.object(
+            FormItem.objects, "bulk_create", side_effect=IntegrityError("NOT NULL")
+        ):
+            with self.assertRaises(IntegrityError):
+                client.post(self.url)
+        self.assertFalse(Application.objects.exists())
+
+
+class SubmitScoringFormTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.client.post(reverse("core:queue-apply", kwargs={"pk": self.queue.id}))
+        self.application = Application.objects.get(user=self.user)
+        self.items = list(self.application.scoring_form.items.order_by("pk"))
+        self.url = reverse(
+            "core:application-submit-scoring-form",
+            kwargs={"pk": self.application.id},
+        )
+
+    def test_answers_are_written_in_one_batch(self):
+        data = [{"form_item_id": item.id, "answer": 1} for item in self.items]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        writes = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "core_formitem"')
+        ]
+        self.assertEqual(len(writes), 1)
+        form = self.application.scoring_form
+        self.assertEqual(
+            form.base_points,
+            sum(item["point"] for item in SIRA_TAHSIS_4_NOLU_CETVEL_FORM),
+        )
+        self.assertEqual(response.data["total_points"], form.base_points)
+
+    def test_invalid_payload_changes_nothing(self):
+        text_item = self.items[0]
+        data = [
+            {"form_item_id": self.items[1].id, "answer": 2},
+            {"form_item_id": text_item.id, "answer": "iki"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.items[1].refresh_from_db()
+        self.assertEqual(self.items[1].answer, {"value": None})
+        self.assertEqual(self.application.scoring_form.base_points, 0)
+        self.assertFalse(ScoringFormLog.objects.exists())
+
+    def test_oversized_integer_answer_is_rejected(self):
+        integer_item = next(
+            item for item in self.items if item.field_type == FormItemTypes.INTEGER
+        )
+        data = [{"form_item_id": integer_item.id, "answer": MAX_INTEGER_ANSWER + 1}]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        integer_item.refresh_from_db()
+        self.assertEqual(integer_item.answer, {"value": None})
+
+
+class FakeS3Client:
+    def __init__(self, objects):
+        self.objects = objects
+        self.calls = []
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head_object", Key))
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.calls.append(("copy_object", Key))
+        self.objects[Key] = self.objects[CopySource["Key"]]
+
+    def get_object(self, Bucket, Key):
+        self.calls.append(("get_object", Key))
+        return {
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+            "Body": BytesIO(self.objects[Key]),
+        }
+
+
+class S3ClientProviderTests(SimpleTestCase):
+    def test_client_is_reused_within_a_process(self):
+        provider = S3ClientProvider()
+        self.assertIs(provider(), provider())
+
+    def test_client_is_rebuilt_after_fork(self):
+        provider = S3ClientProvider()
+        client = provider()
+        with mock.patch("core.storage.os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(provider(), client)
+
+    @override_settings(
+        AWS_S3_ENDPOINT_URL="http://localhost:9000", AWS_S3_MAX_POOL_CONNECTIONS=32
+    )
+    def test_client_is_configured_from_settings(self):
+        client = S3ClientProvider()()
+        self.assertEqual(client.meta.endpoint_url, "http://localhost:9000")
+        self.assertEqual(client.meta.region_name, "eu-central-1")
+        self.assertEqual(client.meta.config.max_pool_connections, 32)
+        self.assertEqual(client.meta.config.signature_version, "s3v4")
+
+
+class SubmitDocumentsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="pw"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.queue = Queue.objects.create(
+            lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+            personel_type=PersonalType.ADMINISTRATIVE,
+            lodgement_size=LodgementSize.ONE_PLUS_ONE,
+        )
+        self.application = create_scored_application(
+            self.user, self.queue, 0, status=ApplicationStatus.IN_PROGRESS
+        )
+        self.document = Document.objects.create(name="Kimlik")
+        self.url = reverse(
+            "core:application-submit-documents", kwargs={"pk": self.application.id}
+        )
+        self.uploaded_key = "default/application_documents/testuser-kimlik.pdf"
+        self.s3 = FakeS3Client(
+            {
+                self.uploaded_key: b"0" * (64 * 1024 * 1024),
+                "uploads/other.pdf": b"%PDF-1.4",
+            }
+        )
+
+    def submit(self, *keys):
+        with mock.patch("core.views.s3_client", return_value=self.s3):
+            return self.client.post(
+                self.url,
+                [
+                    {"document_id": self.document.id, "file": key, "description": "-"}
+                    for key in keys
+                ],
+                format="json",
+            )
+
+    def test_uploaded_file_is_registered_without_downloading_it(self):
+        tracemalloc.start()
+        try:
+            response = self.submit(self.uploaded_key)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(peak, 8 * 1024 * 1024)
+        self.assertEqual(self.s3.calls, [("head_object", self.uploaded_key)])
+        self.assertEqual(
+            self.application.documents.get().file.name,
+            "application_documents/testuser-kimlik.pdf",
+        )
+
+    def test_files_outside_the_upload_prefix_are_copied_server_side(self):
+        response = self.submit("uploads/other.pdf")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.s3.calls,
+            [
+                ("head_object", "uploads/other.pdf"),
+                ("copy_object", "default/application_documents/other.pdf"),
+            ],
+        )
+
+    def test_missing_file(self):
+        response = self.submit("default/application_documents/missing.pdf")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(self.application.documents.exists())
+
+    def test_several_files_are_registered_in_one_batch(self):
+        keys = [f"default/application_documents/file-{i}.pdf" for i in range(6)]
+        self.s3.objects.update({key: b"%PDF-1.4" for key in keys})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.submit(*keys)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        inserts = [
+            q
+            for q in queries.captured_queries
+            if q["sql"].startswith('INSERT INTO "core_applicationdocument"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(self.application.documents.values_list("file", flat=True)),
+            [f"application_documents/file-{i}.pdf" for i in range(6)],
+        )
+
+        # The response reuses the loaded application, only its documents are
+        # read again.
+        application_reads = [
+            q
+            for q in queries.captured_queries
+            if q["sql"].startswith('SELECT "core_application"."id"')
+        ]
+        self.assertEqual(len(application_reads), 1)
+        self.assertEqual(len(response.data["documents"]), 6)
+
+    def test_one_missing_file_rejects_the_whole_submission(self):
+        response = self.submit(
+            self.uploaded_key, "default/application_documents/missing.pdf"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(self.application.documents.exists())
+
+    def test_unknown_document(self):
+        with mock.patch("core.views.s3_client", return_value=self.s3):
+            response = self.client.post(
+                self.url,
+                [{"document_id": 0, "file": self.uploaded_key, "description": "-"}],
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.s3.calls, [])
+
+
+class PublicListCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        Announcement.objects.create(title="Duyuru", content="İlk duyuru")
+        self.faq = FaqComponent.objects.create(question="Soru", answer="Cevap", order=1)
+        self.announcement_url = reverse("core:announcement-list")
+        self.faq_url = reverse("core:faq-list")
+
+    def test_repeat_requests_are_served_from_the_cache(self):
+        response = self.client.get(self.announcement_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]["title"], "Duyuru")
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.announcement_url)
+            not_modified = self.client.get(
+                self.announcement_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b"")
+
+    def test_saving_an_announcement_invalidates_the_cache(self):
+        etag = self.client.get(self.announcement_url)["ETag"]
+        Announcement.objects.create(title="Yeni", content="İkinci duyuru")
+
+        response = self.client.get(self.announcement_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_deleting_a_faq_component_invalidates_the_cache(self):
+        self.assertEqual(len(self.client.get(self.faq_url).json()), 1)
+        self.faq.delete()
+        self.assertEqual(self.client.get(self.faq_url).json(), [])
+
+    def test_entries_expire(self):
+        with mock.patch("core.cache.cache.set", wraps=cache.set) as cache_set:
+            with mock.patch("core.cache.cache.add", wraps=cache.add) as cache_add:
+                Announcement.objects.create(title="Yeni", content="İkinci duyuru")
+                self.client.get(self.announcement_url)
+                scoring_form_items.invalidate()
+                scoring_form_items.get(1)
+        calls = cache_set.call_args_list + cache_add.call_args_list
+        self.assertGreaterEqual(len(calls), 3)
+        for call in calls:
+            self.assertIsNotNone(call.kwargs["timeout"])
+
+    def test_version_is_replaced_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title="Yeni", content="İkinci duyuru")
+            # A concurrent reader rendering the rows from before the write.
+            version = cache.get(announcements.version_key)
+            cache.set(f"announcements:{version}", ('"stale"', b"[]"), timeout=None)
+
+        response = self.client.get(self.announcement_url)
+        self.assertNotEqual(response["ETag"], '"stale"')
+        self.assertEqual(len(response.json()), 2)
+
+
+class QueryPlanTests(APITestCase):
+    """
+    Fails when a hot query stops using its index from migration 0007 on a
+    seeded dataset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(username=f"user{i}", password="pw")
+            for i in range(20)
+        ]
+        cls.queues = [
+            Queue.objects.create(
+                lodgement_type=LodgementType.SEQUENTIAL_ALLOCATION,
+                personel_type=PersonalType.ADMINISTRATIVE,
+                lodgement_size=size,
+            )
+            for size in LodgementSize.values
+        ]
+        for queue in cls.queues:
+            Lodgement.objects.bulk_create(
+                Lodgement(
+                    size=LodgementSizes.ONE_PLUS_ONE,
+                    description="Lodgement",
+                    location="Kilyos",
+                    queue=queue,
+                )
+                for _ in range(20)
+            )
+            for i, user in enumerate(users):
+                create_scored_application(
+                    user, queue, i, status=ApplicationStatus.values[i % 6]
+                )
+        ScoringFormLog.objects.bulk_create(
+            ScoringFormLog(user=user, data=[]) for user in users for _ in range(5)
+        )
+        Announcement.objects.bulk_create(
+            Announcement(title=f"Duyuru {i}", content="-", is_visible=i % 2)
+            for i in range(50)
+        )
+        cls.user = users[0]
+        cls.queue = cls.queues[0]
+        cls.application = cls.queue.applications.first()
+
+    def assert_uses_index(self, queryset, index):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            elif connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+        plan = queryset.explain()
+        # Index scans name the index on both SQLite and PostgreSQL.
+        self.assertRegex(plan, rf"\b{index}\b")
+
+    def test_applications_by_queue_and_status(self):
+        self.assert_uses_index(
+            Application.objects.filter(
+                queue=self.queue, status=ApplicationStatus.APPROVED
+            ),
+            "application_queue_status_idx",
+        )
+
+    def test_active_application_of_user(self):
+        self.assert_uses_index(
+            Application.objects.filter(user=self.user, queue=self.queue).exclude(
+                status__in=[ApplicationStatus.CANCELLED, ApplicationStatus.REJECTED]
+            ),
+            "application_user_queue_idx",
+        )
+
+    def test_scoring_form_of_application(self):
+        self.assert_uses_index(
+            Form.objects.filter(application=self.application, type=FormType.SCORING),
+            "form_application_type_idx",
+        )
+
+    def test_last_scoring_form_log(self):
+        self.assert_uses_index(
+            ScoringFormLog.objects.filter(user=self.user).order_by("-id")[:1],
+            "scoringformlog_user_id_idx",
+        )
+
+    def test_lodgements_by_busy_until(self):
+        self.assert_uses_index(
+            Lodgement.objects.filter(queue=self.queue).order_by("busy_until"),
+            "lodgement_queue_busy_idx",
+        )
+
+    def test_visible_announcements(self):
+        self.assert_uses_index(
+            Announcement.objects.filter(is_visible=True).order_by("-created_at"),
+            "announcement_visible_idx",
+        )
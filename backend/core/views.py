@@ -1,8 +1,12 @@
+import hashlib
 from datetime import datetime
 
-import boto3
-from django.core.files.base import ContentFile
-from django.http import JsonResponse
+from botocore.exceptions import ClientError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, prefetch_related_objects
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, parse_etags
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -15,6 +19,7 @@ from .constants import (
     FormType,
     SIRA_TAHSIS_4_NOLU_CETVEL_FORM,
     FormItemTypes,
+    MAX_INTEGER_ANSWER,
     days_until,
 )
 from .models import (
@@ -27,23 +32,62 @@ from .models import (
     Document,
     ScoringFormItem,
     ScoringFormLog,
-    Announcement,
-    FaqComponent,
+    violates_constraint,
 )
+from .cache import announcements, faq_components, scoring_form_items
 from .permissions import IsAuthenticatedManager
+from .priority import priority_queues
+from .storage import register_uploaded_files, s3_client
 from .serializers import (
     LodgementSerializer,
     ApplicationSerializer,
     QueueSerializer,
     ScoringFormItemSerializer,
     ApplicationListSerializer,
-    AnnouncementSerializer,
-    FaqComponentSerializer,
 )
 
 
-class LodgementViewSet(viewsets.ModelViewSet):
-    queryset = Lodgement.objects.all()
+class ConditionalQuerysetMixin:
+    """
+    Answers conditional GETs from an ETag built from the row count and the
+    latest ``updated_at`` of the queryset and of the related rows listed in
+    ``validator_fields``, so unchanged data is never serialized.
+
+    There is no Last-Modified, deleting a row other than the newest leaves
+    every ``updated_at`` as it was.
+    """
+
+    validator_fields = ("updated_at",)
+
+    def get_validators(self, queryset):
+        aggregates = queryset.aggregate(
+            rows=Count("pk", distinct=True),
+            **{
+                f"modified_{i}": Max(field)
+                for i, field in enumerate(self.validator_fields)
+            },
+        )
+        rows = aggregates.pop("rows")
+        key = "|".join(
+            [self.request.get_full_path(), str(queryset.query), str(rows)]
+            + [value.isoformat() for value in aggregates.values() if value is not None]
+        )
+        return rows, f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    def conditional_response(self, queryset, respond):
+        rows, etag = self.get_validators(queryset)
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = respond(rows)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
+
+
+class LodgementViewSet(ConditionalQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Lodgement.objects.select_related("queue").prefetch_related(
+        "queue__required_documents"
+    )
     serializer_class = LodgementSerializer
     permission_classes = [IsAuthenticated]
 
@@ -67,8 +111,21 @@ class LodgementViewSet(viewsets.ModelViewSet):
                 for permission in self.permission_classes_by_action["default"]
             ]
 
+    validator_fields = (
+        "updated_at",
+        "queue__updated_at",
+        "queue__required_documents__updated_at",
+    )
+
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
+        return self.conditional_response(queryset, lambda rows: self.render(queryset))
+
+    def render(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -117,37 +174,40 @@ class ScoringFormViewSet(viewsets.ModelViewSet):
         return Response(data)
 
 
-class QueueViewSet(viewsets.ModelViewSet):
+class QueueViewSet(ConditionalQuerysetMixin, viewsets.ModelViewSet):
     queryset = Queue.objects.all()
     serializer_class = QueueSerializer
     permission_classes = [IsAuthenticated]
+    validator_fields = ("updated_at", "required_documents__updated_at")
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Queue.objects.prefetch_related("required_documents")
         if user.role in [UserRoles.MANAGER, UserRoles.ADMIN]:
-            return Queue.objects.all()
-        return Queue.objects.filter(personel_type=user.type)
+            return queryset
+        return queryset.filter(personel_type=user.type)
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-
-        if not queryset.exists():
-            return Response(
-                {"error": "Queue not found"}, status=status.HTTP_404_NOT_FOUND
-            )
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.conditional_response(
+            queryset, lambda rows: self.render(queryset, rows, many=True)
+        )
 
     def retrieve(self, request, *args, **kwargs):
-        try:
-            instance = self.get_queryset().get(pk=kwargs.get("pk"))
-        except Application.DoesNotExist:
+        queryset = self.get_queryset().filter(pk=kwargs.get("pk"))
+        return self.conditional_response(
+            queryset, lambda rows: self.render(queryset, rows, many=False)
+        )
+
+    def render(self, queryset, rows, many):
+        if not rows:
             return Response(
                 {"error": "Queue not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = self.get_serializer(instance)
+        serializer = self.get_serializer(
+            queryset if many else queryset.get(), many=many
+        )
         return Response(serializer.data)
 
     @action(detail=True, methods=["POST"])
@@ -167,47 +227,48 @@ class QueueViewSet(viewsets.ModelViewSet):
                 {"error": "Queue not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        applications = Application.objects.filter(
-            user=user,
-            queue=queue,
-        ).exclude(status__in=[ApplicationStatus.CANCELLED, ApplicationStatus.REJECTED])
-        if applications.exists():
+        log = ScoringFormLog.objects.filter(user=user).last()
+        previous_answers = {}
+        scoring_items = scoring_form_items.snapshot()
+        for item in log.data if log else []:
+            scoring_form_item = scoring_items.get(item.get("scoring_form_item_id"))
+            if scoring_form_item:
+                previous_answers.setdefault(scoring_form_item.label, item.get("answer"))
+
+        # unique_active_application rejects a second active application.
+        try:
+            with transaction.atomic():
+                application = Application.objects.create(
+                    user=user, status=ApplicationStatus.IN_PROGRESS, queue=queue
+                )
+
+                form = Form(type=FormType.SCORING, application=application)
+                items = [
+                    FormItem(
+                        form=form,
+                        label=item["label"],
+                        caption=item["caption"],
+                        field_type=item["field_type"],
+                        point=item["point"],
+                        answer={"value": previous_answers.get(item["label"])},
+                    )
+                    for item in SIRA_TAHSIS_4_NOLU_CETVEL_FORM
+                ]
+                form.base_points = sum(item.earned_points for item in items)
+                form.save()
+                FormItem.objects.bulk_create(items)
+                # Serialized before the commit, so a failure after it can't
+                # hide an application that was created.
+                data = ApplicationSerializer(application).data
+        except IntegrityError as e:
+            if not violates_constraint(e, Application, "unique_active_application"):
+                raise
             return JsonResponse(
                 {"error": "You already have an active application for this queue"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        application = Application.objects.create(
-            user=user, status=ApplicationStatus.IN_PROGRESS, queue=queue
-        )
-
-        form = Form.objects.create(type=FormType.SCORING, application=application)
-
-        log = ScoringFormLog.objects.filter(user=user).last()
-        data = log.data if log else []
-        for item in data:
-            item["label"] = (
-                ScoringFormItem.objects.filter(id=item.get("scoring_form_item_id"))
-                .first()
-                .label
-            )
-
-        for item in SIRA_TAHSIS_4_NOLU_CETVEL_FORM:
-            answer = None
-            for item_data in data:
-                if item_data["label"] == item["label"]:
-                    answer = item_data["answer"]
-                    break
-            form.items.create(
-                label=item["label"],
-                caption=item["caption"],
-                field_type=item["field_type"],
-                point=item["point"],
-                answer={"value": answer},
-            )
-
-        serializer = ApplicationSerializer(application)
-        return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["POST"])
     def evaluate(self, request, *args, **kwargs):
@@ -224,6 +285,7 @@ class QueueViewSet(viewsets.ModelViewSet):
             )
 
         total_points = 0
+        scoring_items = scoring_form_items.snapshot()
         for item in form_data:
             scoring_form_item_id = item.get("scoring_form_item_id")
             answer = item.get("answer")
@@ -231,9 +293,7 @@ class QueueViewSet(viewsets.ModelViewSet):
             if scoring_form_item_id is None or answer is None:
                 continue
 
-            scoring_form_item = ScoringFormItem.objects.filter(
-                id=scoring_form_item_id
-            ).first()
+            scoring_form_item = scoring_items.get(scoring_form_item_id)
             if not scoring_form_item:
                 continue
 
@@ -243,6 +303,11 @@ class QueueViewSet(viewsets.ModelViewSet):
                         {"error": "Invalid data type for an answer"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
+                if abs(answer) > MAX_INTEGER_ANSWER:
+                    return Response(
+                        {"error": f"Answers must be at most {MAX_INTEGER_ANSWER}"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
             elif scoring_form_item.field_type == FormItemTypes.BOOLEAN:
                 if not isinstance(answer, int):
                     return Response(
@@ -254,25 +319,9 @@ class QueueViewSet(viewsets.ModelViewSet):
 
         ScoringFormLog.objects.create(user=user, data=form_data)
 
-        applications = queue.applications.filter(
-            status__in=[ApplicationStatus.APPROVED],
-        )
-
-        current_rank = 1
-        for application in applications:
-            if application.scoring_form.total_points > total_points:
-                current_rank += 1
-
-        if queue.lodgements.count() == 0:
-            approximate_availability = None
-        else:
-            new_application = Application(user=user, queue=queue, id=-1)
-            pq = queue.get_priority_queue(
-                new_application=new_application, new_application_points=total_points
-            )
-            approximate_availability = list(
-                filter(lambda x: x.get("application").id == -1, pq)
-            )[0].get("estimated_availability_date")
+        snapshot = priority_queues.get(queue)
+        current_rank = snapshot.rank(total_points)
+        approximate_availability = snapshot.hypothetical_availability(total_points)
 
         return Response(
             {
@@ -282,6 +331,57 @@ class QueueViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=True, methods=["GET"], permission_classes=[IsAuthenticatedManager])
+    def positions(self, request, *args, **kwargs):
+        queue = Queue.objects.filter(id=kwargs.get("pk")).first()
+        if not queue:
+            return Response(
+                {"error": "Queue not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        applications = queue.applications.with_queue_positions()
+        return Response(
+            [
+                {
+                    "application_id": application.id,
+                    "user_id": application.user_id,
+                    "total_points": application.total_points,
+                    "rank": application.queue_rank,
+                    "position": application.queue_position,
+                    "lodgement_id": application.slot_lodgement_id,
+                    "estimated_availability": days_until(
+                        application.estimated_availability
+                    ),
+                }
+                for application in applications
+            ]
+        )
+
+    @action(detail=True, methods=["GET"], permission_classes=[IsAuthenticatedManager])
+    def simulate(self, request, *args, **kwargs):
+        queue = Queue.objects.filter(id=kwargs.get("pk")).first()
+        if not queue:
+            return Response(
+                {"error": "Queue not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        simulation = queue.simulate_assignments()
+        return Response(
+            {
+                "queue": queue.id,
+                "elapsed_ms": round(simulation["elapsed"] * 1000, 2),
+                "assignments": [
+                    {
+                        "application_id": application.id,
+                        "lodgement_id": lodgement.id,
+                        "lodgement_name": lodgement.name,
+                        "start_date": start_date,
+                    }
+                    for application, lodgement, start_date in simulation["assignments"]
+                ],
+            }
+        )
+
 
 class ApplicationViewSet(viewsets.ModelViewSet):
     queryset = Application.objects.all()
@@ -289,8 +389,10 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Application.objects.filter(user=user)
+        queryset = Application.objects.filter(user=self.request.user)
+        if self.action == "list":
+            return queryset.select_related("queue")
+        return queryset.with_details()
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -332,63 +434,89 @@ class ApplicationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        log_data = []
+        submitted = []
+        for item in form_data:
+            if not isinstance(item, dict):
+                return Response(
+                    {"error": "Invalid data format, expected a list of items"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            form_item_id = item.get("form_item_id")
+            answer = item.get("answer")
 
-        try:
-            for item in form_data:
-                form_item_id = item.get("form_item_id")
-                answer = item.get("answer")
+            if form_item_id is None or answer is None:
+                continue
 
-                if form_item_id is None or answer is None:
-                    continue
+            try:
+                submitted.append((int(form_item_id), answer))
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": f"Invalid form item ID, {form_item_id}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-                form_item = FormItem.objects.filter(
-                    id=form_item_id, form=scoring_form
-                ).first()
-                if not form_item:
-                    continue
+        # The items are prefetched with the application, updating them in
+        # place keeps the response in sync without reloading them.
+        form_items = {item.id: item for item in scoring_form.items.all()}
 
-                if form_item.field_type == FormItemTypes.INTEGER:
-                    if not isinstance(answer, int):
-                        return Response(
-                            {"error": "Invalid data type for an answer"},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-                elif form_item.field_type == FormItemTypes.BOOLEAN:
+        log_data = []
+        updated_items = {}
+        now = timezone.now()
+        scoring_items = scoring_form_items.snapshot()
+        for form_item_id, answer in submitted:
+            form_item = form_items.get(form_item_id)
+            if not form_item:
+                continue
+
+            if form_item.field_type == FormItemTypes.INTEGER:
+                if not isinstance(answer, int):
+                    return Response(
+                        {"error": "Invalid data type for an answer"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                if abs(answer) > MAX_INTEGER_ANSWER:
+                    return Response(
+                        {"error": f"Answers must be at most {MAX_INTEGER_ANSWER}"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            elif form_item.field_type == FormItemTypes.BOOLEAN:
+                if not isinstance(answer, int):
+                    return Response(
+                        {"error": "Invalid data type for an answer"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            elif form_item.field_type == FormItemTypes.TEXT:
+                if not isinstance(answer, str):
                     if not isinstance(answer, int):
                         return Response(
                             {"error": "Invalid data type for an answer"},
                             status=status.HTTP_400_BAD_REQUEST,
                         )
-                elif form_item.field_type == FormItemTypes.TEXT:
-                    if not isinstance(answer, str):
-                        if not isinstance(answer, int):
-                            return Response(
-                                {"error": "Invalid data type for an answer"},
-                                status=status.HTTP_400_BAD_REQUEST,
-                            )
-
-                if ScoringFormItem.objects.filter(label=form_item.label).exists():
-                    log_data.append(
-                        {
-                            "scoring_form_item_id": ScoringFormItem.objects.filter(
-                                label=form_item.label
-                            )
-                            .first()
-                            .id,
-                            "answer": answer,
-                        }
-                    )
-                form_item.answer = {"value": answer}
-                form_item.save()
 
+            scoring_form_item = scoring_items.get_by_label(form_item.label)
+            if scoring_form_item:
+                log_data.append(
+                    {
+                        "scoring_form_item_id": scoring_form_item.id,
+                        "answer": answer,
+                    }
+                )
+            form_item.answer = {"value": answer}
+            form_item.updated_at = now
+            updated_items[form_item_id] = form_item
+
+        # Nothing is written until every answer has been validated.
+        with transaction.atomic():
+            FormItem.objects.bulk_update(
+                list(updated_items.values()), ["answer", "updated_at"]
+            )
+            scoring_form.refresh_base_points()
+            priority_queues.update_application(application.queue_id, application.id)
             if log_data:
                 ScoringFormLog.objects.create(user=request.user, data=log_data)
-            serializer = self.get_serializer(application)
-            return Response(serializer.data)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(application)
+        return Response(serializer.data)
 
     @action(detail=True, methods=["GET"], url_path="submit-documents/presigned-url")
     def get_presigned_url(self, request, pk=None):
@@ -417,13 +545,7 @@ class ApplicationViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND
             )
-        from botocore.client import Config
-
-        s3 = boto3.client(
-            "s3",
-            region_name="eu-central-1",
-            config=Config(signature_version="s3v4"),
-        )
+        s3 = s3_client()
         bucket_name = AWS_STORAGE_BUCKET_NAME
         file_name = f"default/application_documents/{request.user.email}-{document.name}-{datetime.now().isoformat()}.{file_format}"
         presigned_url = s3.generate_presigned_post(
@@ -464,35 +586,41 @@ class ApplicationViewSet(viewsets.ModelViewSet):
                 {"error": "Document is required"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        s3 = boto3.client("s3")
-        bucket_name = AWS_STORAGE_BUCKET_NAME
-
-        for obj in data:
-            document_id = obj.get("document_id")
-            document = Document.objects.filter(id=document_id).first()
-            if not document:
+        document_ids = [obj.get("document_id") for obj in data]
+        documents = {
+            str(document.id): document
+            for document in Document.objects.filter(id__in=document_ids)
+        }
+        for document_id in document_ids:
+            if str(document_id) not in documents:
                 return Response(
                     {"error": f"Document with ID {document_id} not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            description = obj.get("description")
-            file = obj.get("file")
-            response = s3.get_object(Bucket=bucket_name, Key=file)
-            if response["ResponseMetadata"]["HTTPStatusCode"] != 200:
-                return Response(
-                    {"error": "File not found"}, status=status.HTTP_404_NOT_FOUND
+
+        try:
+            names = register_uploaded_files(
+                s3_client(), [obj.get("file") for obj in data]
+            )
+        except ClientError:
+            return Response(
+                {"error": "File not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        with transaction.atomic():
+            ApplicationDocument.objects.bulk_create(
+                ApplicationDocument(
+                    document=documents[str(obj.get("document_id"))],
+                    application=application,
+                    description=obj.get("description"),
+                    file=name,
                 )
-            file_content = response["Body"].read()
-            django_file = ContentFile(file_content, name=file.split("/")[-1])
-
-            ApplicationDocument.objects.create(
-                document=document,
-                application=application,
-                description=description,
-                file=django_file,
+                for obj, name in zip(data, names)
             )
 
-        application = self.get_object()
+        # Only the documents changed, the rest of the prefetch is still current.
+        application._prefetched_objects_cache.pop("documents", None)
+        prefetch_related_objects([application], "documents__document")
         serializer = self.get_serializer(application)
         return Response(serializer.data)
 
@@ -558,7 +686,13 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticatedManager],
     )
     def applications_waiting_for_review(self, request):
-        applications = Application.objects.filter(status=ApplicationStatus.PENDING)
+        applications = Application.objects.filter(
+            status=ApplicationStatus.PENDING
+        ).with_details()
+        page = self.paginate_queryset(applications)
+        if page is not None:
+            serializer = ApplicationSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = ApplicationSerializer(applications, many=True)
         return Response(serializer.data)
 
@@ -571,7 +705,7 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     def get_application_manager(self, request):
         data = request.data
         application_id = data.get("application_id")
-        application = Application.objects.get(id=application_id)
+        application = Application.objects.with_details().get(id=application_id)
         serializer = ApplicationSerializer(application)
         return Response(serializer.data)
 
@@ -584,7 +718,7 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     def review(self, request):
         data = request.data
         application_id = data.get("application_id")
-        application = Application.objects.get(id=application_id)
+        application = Application.objects.with_details().get(id=application_id)
         if application.status != ApplicationStatus.PENDING:
             return Response(
                 {"error": "Application status is not suitable for this operation."},
@@ -612,19 +746,26 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+def rendered_list_response(request, rendered_list):
+    etag, content = rendered_list.get()
+    if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
 class AnnouncementListView(viewsets.ViewSet):
     permission_classes = []
 
     def list(self, request):
-        queryset = Announcement.objects.filter(is_visible=True).order_by("-created_at")
-        serializer = AnnouncementSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return rendered_list_response(request, announcements)
 
 
 class FaqComponentListView(viewsets.ViewSet):
     permission_classes = []
 
     def list(self, request):
-        queryset = FaqComponent.objects.filter(is_visible=True).order_by("order")
-        serializer = FaqComponentSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return rendered_list_response(request, faq_components)
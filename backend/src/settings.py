@@ -75,11 +75,26 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+# Shared by every worker in production, e.g. CACHE_URL=redis://localhost:6379/1.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# Authenticated tokens are cached per worker for AUTH_TOKEN_CACHE_TTL seconds,
+# and in CACHES as well with AUTH_TOKEN_CACHE_SHARED.
+AUTH_TOKEN_CACHE_TTL = env.int("AUTH_TOKEN_CACHE_TTL", default=60)
+AUTH_TOKEN_CACHE_SIZE = env.int("AUTH_TOKEN_CACHE_SIZE", default=1024)
+AUTH_TOKEN_CACHE_SHARED = env.bool("AUTH_TOKEN_CACHE_SHARED", default=False)
+
+# Upper bound on how long a priority queue snapshot is cached, in case a write
+# from another process never reaches this worker's CACHES.
+PRIORITY_QUEUE_CACHE_TIMEOUT = env.int("PRIORITY_QUEUE_CACHE_TIMEOUT", default=3600)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "authentication.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 CORS_ALLOW_ALL_ORIGINS = True
 ROOT_URLCONF = "src.urls"
@@ -175,6 +190,8 @@ AWS_S3_OBJECT_PARAMETERS = {
 }
 AWS_S3_REGION_NAME = "eu-central-1"
 AWS_S3_SIGNATURE_VERSION = "s3v4"
+AWS_S3_MAX_POOL_CONNECTIONS = env.int("AWS_S3_MAX_POOL_CONNECTIONS", default=10)
+AWS_S3_ENDPOINT_URL = env("AWS_S3_ENDPOINT_URL", default=None)
 AWS_LOCATION = "default"
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"